@@ -1,4 +1,6 @@
 import configparser
+import os
+import shutil
 
 import pytest
 
@@ -19,3 +21,35 @@ def config() -> configparser.ConfigParser:
     test_config = configparser.ConfigParser()
     test_config.read(test_ini)
     yield test_config
+
+
+def set_sqlite_pragmas(dbapi_connection, connection_record):
+    """Sets SQLite pragmas suited to disposable test databases, trading
+    durability for speed. This is a listener for SQLAlchemy engine "connect"
+    events."""
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=MEMORY")
+    cursor.execute("PRAGMA synchronous=OFF")
+    cursor.execute("PRAGMA temp_store=MEMORY")
+    cursor.close()
+
+
+def xdist_worker() -> str:
+    """Returns the pytest-xdist worker ID of this process, e.g. "gw0", or an
+    empty string if the tests are not being run by pytest-xdist workers."""
+    return os.environ.get("PYTEST_XDIST_WORKER", "")
+
+
+def pytest_sessionfinish(session, exitstatus):
+    """Removes the iRODS test groups at the end of a pytest-xdist run. The
+    workers leave the groups in place because none of them can know whether
+    the others still need them, so the controller removes them once all the
+    workers have finished."""
+    is_worker = hasattr(session.config, "workerinput")
+    distributed = getattr(session.config.option, "dist", "no") != "no"
+    if is_worker or not distributed or shutil.which("iadmin") is None:
+        return
+
+    # Imported here because the iRODS fixtures import from this module
+    from tests.irods_fixture import remove_test_groups
+    remove_test_groups()
@@ -1,94 +1,241 @@
-import os
+from functools import lru_cache
 from pathlib import PurePath
 
 import pytest
 
-from workbot.irods import AVU, BatonClient, Collection, have_admin, imkdir, \
-    iput, irm, \
-    mkgroup, rmgroup
+from tests.conftest import xdist_worker
+from workbot.irods import AVU, BatonClient, Collection, DataObject, \
+    RodsError, have_admin, icp, imkdir, iput, irm, lsgroups, mkgroup, \
+    rmgroup
 from workbot.metadata import ONTMetadata
 
-tests_have_admin = pytest.mark.skipif(not have_admin(),
-                                      reason="tests do not have iRODS "
-                                             "admin access")
+# Skips tests that need iRODS admin access when it is not available. The
+# check is made when such a test is set up, rather than when test modules are
+# imported, so that collecting tests does not run iadmin.
+tests_have_admin = pytest.mark.usefixtures("irods_admin")
 
 TEST_GROUPS = ["ss_study_01", "ss_study_02", "ss_study_03"]
 
+# Metadata added to runs in the synthetic test data, keyed on run path
+# relative to the experiment root
+SYNTHETIC_RUN_METADATA = {
+    PurePath("simple_experiment_001",
+             "20190904_1514_GA10000_flowcell011_69126024"):
+        (AVU(ONTMetadata.EXPERIMENT_NAME.value, "simple_experiment_001",
+             namespace=ONTMetadata.namespace),
+         AVU(ONTMetadata.INSTRUMENT_SLOT.value, "1",
+             namespace=ONTMetadata.namespace)),
+    PurePath("multiplexed_experiment_001",
+             "20190904_1514_GA10000_flowcell101_cf751ba1"):
+        (AVU(ONTMetadata.EXPERIMENT_NAME.value, "multiplexed_experiment_001",
+             namespace=ONTMetadata.namespace),
+         AVU(ONTMetadata.INSTRUMENT_SLOT.value, "1",
+             namespace=ONTMetadata.namespace))}
+
+# A run collection, and a data object within it, in the gridion test data,
+# relative to the experiment root
+GRIDION_RUN = PurePath("66", "DN585561I_A1",
+                       "20190904_1514_GA20000_FAL01979_43578c8f")
+GRIDION_FINAL_SUMMARY = PurePath(GRIDION_RUN, "final_summary.txt")
+
+# Metadata added to GRIDION_RUN and GRIDION_FINAL_SUMMARY by the
+# irods_gridion_annotated fixture
+GRIDION_RUN_METADATA = (AVU("abcde", "12345"), AVU("vwxyz", "567890"))
+
+
+@lru_cache(maxsize=None)
+def irods_have_admin() -> bool:
+    """Returns true if the tests have iRODS admin access. The check runs an
+    iadmin command, so it is made once, when first needed."""
+    return have_admin()
+
 
 def add_test_groups():
-    if have_admin():
+    if irods_have_admin():
         for g in TEST_GROUPS:
-            mkgroup(g)
+            try:
+                mkgroup(g)
+            except RodsError as e:
+                # Under pytest-xdist, another worker may have made the group
+                if "CATALOG_ALREADY_HAS_ITEM_BY_THAT_NAME" not in str(e):
+                    raise
 
 
 def remove_test_groups():
-    if have_admin():
+    # Under pytest-xdist, a worker can't know whether others still need the
+    # groups, so they are left in place for the controller to remove when
+    # the test session finishes
+    if irods_have_admin() and not xdist_worker():
+        groups = lsgroups()
         for g in TEST_GROUPS:
-            rmgroup(g)
+            if g in groups:
+                rmgroup(g)
 
 
-@pytest.fixture(scope="function")
-def irods_gridion(tmp_path):
-    root_path = "/testZone/home/irods/test"
-    parts = list(tmp_path.parts[1:])
-    rods_path = os.path.join(root_path, *parts)
-    imkdir(rods_path, make_parents=True)
+@pytest.fixture(scope="session")
+def irods_admin():
+    """Skips the requesting test if the tests do not have iRODS admin
+    access."""
+    if not irods_have_admin():
+        pytest.skip("tests do not have iRODS admin access")
+
 
-    iput("./tests/data/gridion", rods_path, recurse=True)
-    expt_root = os.path.join(rods_path, "gridion")
+@pytest.fixture(scope="session")
+def irods_test_root():
+    """Returns a root collection for tests. The collection and the test
+    groups are created once per test session. Tests should create their
+    data in sub-collections of this root. The sub-collection "master" holds
+    the shared test data.
+
+    When the tests are run by pytest-xdist workers, e.g. with
+    "pytest -n 4 --dist=loadfile", each worker has its own root so that
+    workers do not share, or remove, each other's data."""
+    root_path = PurePath("/testZone/home/irods/test", xdist_worker())
+    imkdir(root_path, PurePath(root_path, "master"), make_parents=True)
 
     try:
         add_test_groups()
 
-        yield expt_root
+        yield root_path
     finally:
         irm(root_path, force=True, recurse=True)
         remove_test_groups()
 
 
+@pytest.fixture(scope="session")
+def irods_gridion_master(irods_test_root):
+    """Returns a collection of gridion test data, uploaded once per test
+    session. Tests must not modify this collection; the irods_gridion fixture
+    provides a copy for each test."""
+    rods_path = PurePath(irods_test_root, "master")
+    iput("./tests/data/gridion", rods_path, recurse=True, bulk=True)
+
+    yield PurePath(rods_path, "gridion")
+
+
+@pytest.fixture(scope="session")
+def irods_synthetic_master(irods_test_root):
+    """Returns a collection of synthetic test data, uploaded once per test
+    session. Tests must not modify this collection; the irods_synthetic
+    fixture provides a copy for each test."""
+    rods_path = PurePath(irods_test_root, "master")
+    iput("./tests/data/synthetic", rods_path, recurse=True, bulk=True)
+
+    yield PurePath(rods_path, "synthetic")
+
+
 @pytest.fixture(scope="function")
-def irods_synthetic(tmp_path, baton_session):
-    root_path = "/testZone/home/irods/test"
-    parts = list(tmp_path.parts[1:])
-    rods_path = PurePath(root_path, *parts)
+def irods_gridion(irods_test_root, irods_gridion_master, tmp_path):
+    """Returns a copy of the gridion test data for one test. The copy has no
+    metadata because icp does not copy AVUs."""
+    rods_path = PurePath(irods_test_root, tmp_path.name)
     imkdir(rods_path, make_parents=True)
 
-    iput("./tests/data/synthetic", rods_path, recurse=True)
-    expt_root = PurePath(rods_path, "synthetic")
-
-    avus = [avu.with_namespace(ONTMetadata.namespace) for avu in
-            [AVU(ONTMetadata.EXPERIMENT_NAME.value,
-                 "simple_experiment_001"),
-             AVU(ONTMetadata.INSTRUMENT_SLOT.value,
-                 "1")]]
-
-    Collection(baton_session,
-               PurePath(expt_root,
-                        "simple_experiment_001",
-                        "20190904_1514_GA10000_flowcell011_69126024")). \
-        meta_add(*avus)
-
-    avus = [avu.with_namespace(ONTMetadata.namespace) for avu in
-            [AVU(ONTMetadata.EXPERIMENT_NAME.value,
-                 "multiplexed_experiment_001"),
-             AVU(ONTMetadata.INSTRUMENT_SLOT.value,
-                 "1")]]
-
-    Collection(baton_session,
-               PurePath(expt_root, "multiplexed_experiment_001",
-                        "20190904_1514_GA10000_flowcell101_cf751ba1")). \
-        meta_add(*avus)
+    # A server-side copy avoids transferring the data again for each test
+    icp(irods_gridion_master, rods_path, recurse=True)
+    expt_root = PurePath(rods_path, "gridion")
 
     try:
-        add_test_groups()
+        yield expt_root
+    finally:
+        irm(expt_root, force=True, recurse=True)
+
+
+@pytest.fixture(scope="module")
+def irods_gridion_annotated(irods_test_root, irods_gridion_master,
+                            tmp_path_factory, baton_session):
+    """Returns a copy of the gridion test data where GRIDION_RUN and
+    GRIDION_FINAL_SUMMARY have the AVUs in GRIDION_RUN_METADATA. The metadata
+    are added once per test module. Tests must not modify this collection."""
+    rods_path = PurePath(irods_test_root,
+                         tmp_path_factory.mktemp("annotated").name)
+    imkdir(rods_path, make_parents=True)
 
+    icp(irods_gridion_master, rods_path, recurse=True)
+    expt_root = PurePath(rods_path, "gridion")
+
+    for item in [Collection(baton_session, PurePath(expt_root, GRIDION_RUN)),
+                 DataObject(baton_session,
+                            PurePath(expt_root, GRIDION_FINAL_SUMMARY))]:
+        item.meta_add(*GRIDION_RUN_METADATA)
+
+    try:
         yield expt_root
     finally:
-        irm(root_path, force=True, recurse=True)
-        remove_test_groups()
+        irm(rods_path, force=True, recurse=True)
+
+
+@pytest.fixture(scope="module")
+def irods_gridion_shared(irods_test_root, irods_gridion_master,
+                         tmp_path_factory):
+    """Returns a copy of the gridion test data shared by the tests of a
+    module. Tests should use it through the irods_gridion_meta fixture."""
+    rods_path = PurePath(irods_test_root,
+                         tmp_path_factory.mktemp("shared").name)
+    imkdir(rods_path, make_parents=True)
+
+    icp(irods_gridion_master, rods_path, recurse=True)
+
+    try:
+        yield PurePath(rods_path, "gridion")
+    finally:
+        irm(rods_path, force=True, recurse=True)
 
 
 @pytest.fixture(scope="function")
+def irods_gridion_meta(irods_gridion_shared, baton_session):
+    """Returns a copy of the gridion test data for tests that change only
+    metadata. The copy is shared by the tests of a module, so rather than
+    being copied again for each test, any changes that a test makes to the
+    metadata of GRIDION_RUN, its parent collection or GRIDION_FINAL_SUMMARY
+    are reverted when the test ends."""
+    items = [Collection(baton_session,
+                        PurePath(irods_gridion_shared, GRIDION_RUN.parent)),
+             Collection(baton_session,
+                        PurePath(irods_gridion_shared, GRIDION_RUN)),
+             DataObject(baton_session,
+                        PurePath(irods_gridion_shared, GRIDION_FINAL_SUMMARY))]
+    baseline = [item.metadata() for item in items]
+
+    try:
+        yield irods_gridion_shared
+    finally:
+        for item, avus in zip(items, baseline):
+            current = item.metadata()
+            added = [avu for avu in current if avu not in avus]
+            removed = [avu for avu in avus if avu not in current]
+            if added:
+                item.meta_remove(*added)
+            if removed:
+                item.meta_add(*removed)
+
+
+@pytest.fixture(scope="function")
+def irods_synthetic(irods_test_root, irods_synthetic_master, tmp_path,
+                    baton_session):
+    rods_path = PurePath(irods_test_root, tmp_path.name)
+    imkdir(rods_path, make_parents=True)
+
+    # A server-side copy avoids transferring the data again for each test.
+    # Metadata are not copied, so the master collection remains unannotated.
+    icp(irods_synthetic_master, rods_path, recurse=True)
+    expt_root = PurePath(rods_path, "synthetic")
+
+    # The collections have just been created, so have no metadata. Adding
+    # through the client directly avoids the metadata listing that
+    # Collection.meta_add makes to find AVUs already present.
+    baton_session.meta_add_bulk([{BatonClient.COLL: PurePath(expt_root, run),
+                                  BatonClient.AVUS: avus}
+                                 for run, avus in
+                                 SYNTHETIC_RUN_METADATA.items()])
+
+    try:
+        yield expt_root
+    finally:
+        irm(expt_root, force=True, recurse=True)
+
+
+@pytest.fixture(scope="session")
 def baton_session():
     client = BatonClient()
     client.start()
@@ -97,3 +244,15 @@ def baton_session():
         yield client
     finally:
         client.stop()
+
+
+@pytest.fixture(scope="function")
+def fresh_baton_client():
+    """Returns a new BatonClient that has not been started, for tests of the
+    client itself. The client is stopped, if necessary, when the test ends."""
+    client = BatonClient()
+
+    try:
+        yield client
+    finally:
+        client.stop()
@@ -1,132 +1,193 @@
 from datetime import datetime
+from itertools import product
+from typing import List, Tuple
 
 import pytest
-from sqlalchemy import create_engine
-from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import Session
+from sqlalchemy.pool import StaticPool
 
+from tests.conftest import set_sqlite_pragmas
 from workbot.ml_warehouse_schema import MLWHBase, OseqFlowcell, Sample, Study
 
 EARLY = datetime(year=2020, month=6, day=1, hour=0, minute=0, second=0)
 LATE = datetime(year=2020, month=6, day=14, hour=0, minute=0, second=0)
 LATEST = datetime(year=2020, month=6, day=30, hour=0, minute=0, second=0)
 
+# ONT 12-plex barcode tag identifiers and sequences
+BARCODES = (("ONT_EXP-012-01", "CACAAAGACACCGACAACTTTCTT"),
+            ("ONT_EXP-012-02", "ACAGACGACTACAAACGGAATCGA"),
+            ("ONT_EXP-012-03", "CCTGGTAACTGGGACACAAGACTC"),
+            ("ONT_EXP-012-04", "TAGGGAAACACGATAGAATCCGAA"),
+            ("ONT_EXP-012-05", "AAGGTTACACAAACCCTGGACAAG"),
+            ("ONT_EXP-012-06", "GACTACTTTCTGCCTTTGCGAGAA"),
+
+            ("ONT_EXP-012-07", "AAGGATTCATTCCCACGGTAACAC"),
+            ("ONT_EXP-012-08", "ACGTAACTTGGTTTGTTCCCTGAA"),
+            ("ONT_EXP-012-09", "AACCAAGACTCGCTGTGCCTAGTT"),
+            ("ONT_EXP-012-10", "GAGAGGACAAAGGTTTCAACGCTT"),
+            ("ONT_EXP-012-11", "TCCATTCCCTCCGATAGATGAAAC"),
+            ("ONT_EXP-012-12", "TCCGATTCTGCTTCTTTCTACCTG"))
+
+# Experiment names and instrument positions of the test flowcells. Each
+# experiment has a flowcell in every position.
+SIMPLE_EXPERIMENTS = tuple("simple_experiment_{:03}".format(expt)
+                           for expt in range(1, 6))
+MULTIPLEXED_EXPERIMENTS = tuple("multiplexed_experiment_{:03}".format(expt)
+                                for expt in range(1, 4))
+INSTRUMENT_POSITIONS = tuple(range(1, 6))
+
+
+def late_expt_positions() -> List[Tuple[str, int]]:
+    """Returns the experiment, instrument position pairs of the flowcells
+    updated at LATE or LATEST i.e. every position of the odd-numbered
+    experiments."""
+    return list(product(MULTIPLEXED_EXPERIMENTS[::2] + SIMPLE_EXPERIMENTS[::2],
+                        INSTRUMENT_POSITIONS))
+
+
+def latest_expt_positions() -> List[Tuple[str, int]]:
+    """Returns the experiment, instrument position pairs of the flowcells
+    updated at LATEST i.e. the odd positions of the odd-numbered multiplexed
+    experiments."""
+    return list(product(MULTIPLEXED_EXPERIMENTS[::2],
+                        INSTRUMENT_POSITIONS[::2]))
+
 
 def initialize_mlwh(session: Session):
     instrument_name = "instrument_01"
     pipeline_id_lims = "Ligation"
     req_data_type = "Basecalls and raw data"
 
-    study_x = Study(id_lims="LIMS_01", id_study_lims="study_01",
-                    name="Study X")
-    study_y = Study(id_lims="LIMS_01", id_study_lims="study_02",
-                    name="Study Y")
-    study_z = Study(id_lims="LIMS_01", id_study_lims="study_03",
-                    name="Study Z")
-    session.add_all([study_x, study_y, study_z])
-    session.flush()
+    # The static test data are inserted using SQLAlchemy Core, rather than
+    # as ORM instances, to avoid the overhead of object creation and unit of
+    # work bookkeeping. Primary keys are assigned here so that flowcells may
+    # refer to studies and samples without a round trip to the database.
+    study_x, study_y, study_z = 1, 2, 3
+    studies = [dict(id_study_tmp=study_x, id_lims="LIMS_01",
+                    id_study_lims="study_01", name="Study X"),
+               dict(id_study_tmp=study_y, id_lims="LIMS_01",
+                    id_study_lims="study_02", name="Study Y"),
+               dict(id_study_tmp=study_z, id_lims="LIMS_01",
+                    id_study_lims="study_03", name="Study Z")]
+    session.execute(Study.__table__.insert(), studies)
 
     samples = []
-    flowcells = []
-
     num_samples = 200
     for s in range(1, num_samples + 1):
         sid = "sample{}".format(s)
         name = "sample {}".format(s)
-        samples.append(Sample(id_lims="LIMS_01", id_sample_lims=sid,
-                              name=name))
-    session.add_all(samples)
-    session.flush()
+        samples.append(dict(id_sample_tmp=s, id_lims="LIMS_01",
+                            id_sample_lims=sid, name=name))
+    session.execute(Sample.__table__.insert(), samples)
 
-    num_simple_expts = 5
-    num_instrument_pos = 5
+    # Simple and multiplexed flowcells are inserted separately because an
+    # executemany insert has only the columns present in its first row
+    flowcells = []
     sample_idx = 0
-    for expt in range(1, num_simple_expts + 1):
-        for pos in range(1, num_instrument_pos + 1):
-            expt_name = "simple_experiment_{:03}".format(expt)
-            id_flowcell = "flowcell{:03}".format(pos + 10)
-
-            # All the even experiments have the early datetime
-            # All the odd experiments have the late datetime
-            when_expt = EARLY if expt % 2 == 0 else LATE
-
-            flowcells.append(OseqFlowcell(sample=samples[sample_idx],
-                                          study=study_y,
-                                          instrument_name=instrument_name,
-                                          instrument_slot=pos,
-                                          experiment_name=expt_name,
-                                          id_flowcell_lims=id_flowcell,
-                                          pipeline_id_lims=pipeline_id_lims,
-                                          requested_data_type=req_data_type,
-                                          last_updated=when_expt))
-            sample_idx += 1
-
-    num_multiplexed_expts = 3
-    num_instrument_pos = 5
-    barcodes = ["CACAAAGACACCGACAACTTTCTT",
-                "ACAGACGACTACAAACGGAATCGA",
-                "CCTGGTAACTGGGACACAAGACTC",
-                "TAGGGAAACACGATAGAATCCGAA",
-                "AAGGTTACACAAACCCTGGACAAG",
-                "GACTACTTTCTGCCTTTGCGAGAA",
-
-                "AAGGATTCATTCCCACGGTAACAC",
-                "ACGTAACTTGGTTTGTTCCCTGAA",
-                "AACCAAGACTCGCTGTGCCTAGTT",
-                "GAGAGGACAAAGGTTTCAACGCTT",
-                "TCCATTCCCTCCGATAGATGAAAC",
-                "TCCGATTCTGCTTCTTTCTACCTG"]
+    simple_expts = enumerate(SIMPLE_EXPERIMENTS, start=1)
+    for (expt, expt_name), pos in product(simple_expts, INSTRUMENT_POSITIONS):
+        id_flowcell = "flowcell{:03}".format(pos + 10)
+
+        # All the even experiments have the early datetime
+        # All the odd experiments have the late datetime
+        when_expt = EARLY if expt % 2 == 0 else LATE
+
+        flowcells.append(dict(
+                id_sample_tmp=samples[sample_idx]["id_sample_tmp"],
+                id_study_tmp=study_y,
+                instrument_name=instrument_name,
+                instrument_slot=pos,
+                experiment_name=expt_name,
+                id_flowcell_lims=id_flowcell,
+                pipeline_id_lims=pipeline_id_lims,
+                requested_data_type=req_data_type,
+                last_updated=when_expt))
+        sample_idx += 1
+
+    session.execute(OseqFlowcell.__table__.insert(), flowcells)
 
+    flowcells = []
     msample_idx = 0
-    for expt in range(1, num_multiplexed_expts + 1):
-        for pos in range(1, num_instrument_pos + 1):
-            expt_name = "multiplexed_experiment_{:03}".format(expt)
-            id_flowcell = "flowcell{:03}".format(pos + 100)
-
-            # All the even experiments have the early datetime
-            when = EARLY
-
-            # All the odd experiments have the late datetime
-            if expt % 2 == 1:
-                when = LATE
-                # Or latest if they have an odd instrument position
-                if pos % 2 == 1:
-                    when = LATEST
-
-            for barcode_idx, barcode in enumerate(barcodes):
-                tag_id = "ONT_EXP-012-{:02d}".format(barcode_idx + 1)
-
-                flowcells.append(OseqFlowcell(
-                        sample=samples[msample_idx],
-                        study=study_z,
-                        instrument_name=instrument_name,
-                        instrument_slot=pos,
-                        experiment_name=expt_name,
-                        id_flowcell_lims=id_flowcell,
-                        tag_set_id_lims="ONT_12",
-                        tag_set_name="ONT library barcodes x12",
-                        tag_sequence=barcode,
-                        tag_identifier=tag_id,
-                        pipeline_id_lims=pipeline_id_lims,
-                        requested_data_type=req_data_type,
-                        last_updated=when))
-                msample_idx += 1
-
-    session.add_all(flowcells)
+    multiplexed_expts = enumerate(MULTIPLEXED_EXPERIMENTS, start=1)
+    for (expt, expt_name), pos in product(multiplexed_expts,
+                                          INSTRUMENT_POSITIONS):
+        id_flowcell = "flowcell{:03}".format(pos + 100)
+
+        # All the even experiments have the early datetime
+        when = EARLY
+
+        # All the odd experiments have the late datetime
+        if expt % 2 == 1:
+            when = LATE
+            # Or latest if they have an odd instrument position
+            if pos % 2 == 1:
+                when = LATEST
+
+        for tag_id, barcode in BARCODES:
+            flowcells.append(dict(
+                    id_sample_tmp=samples[msample_idx]["id_sample_tmp"],
+                    id_study_tmp=study_z,
+                    instrument_name=instrument_name,
+                    instrument_slot=pos,
+                    experiment_name=expt_name,
+                    id_flowcell_lims=id_flowcell,
+                    tag_set_id_lims="ONT_12",
+                    tag_set_name="ONT library barcodes x12",
+                    tag_sequence=barcode,
+                    tag_identifier=tag_id,
+                    pipeline_id_lims=pipeline_id_lims,
+                    requested_data_type=req_data_type,
+                    last_updated=when))
+            msample_idx += 1
+
+    session.execute(OseqFlowcell.__table__.insert(), flowcells)
     session.commit()
 
 
-@pytest.fixture(scope="function")
-def mlwh_session(tmp_path) -> Session:
-    p = tmp_path / "mlwh"
-    uri = 'sqlite:///{}'.format(p)
+@pytest.fixture(scope="session")
+def mlwh_engine():
+    """Returns an ML warehouse database engine for testing. The database is
+    an in-memory SQLite database, created and populated once per test
+    session."""
+
+    # An in-memory database exists only as long as its connection, so all
+    # sessions share a single connection
+    engine = create_engine('sqlite://', echo=False,
+                           connect_args={"check_same_thread": False},
+                           poolclass=StaticPool)
+    event.listen(engine, "connect", set_sqlite_pragmas)
 
-    engine = create_engine(uri, echo=False)
-    MLWHBase.metadata.create_all(engine)
+    # The tables are created and populated in a single transaction. The
+    # session joins it, so its commit does not end the transaction.
+    with engine.begin() as connection:
+        # A new in-memory database has no tables to check for before
+        # creating them
+        MLWHBase.metadata.create_all(connection, checkfirst=False)
 
-    session_maker = sessionmaker(bind=engine)
-    sess = session_maker()
+        sess = Session(bind=connection, autoflush=False,
+                       expire_on_commit=False)
+        initialize_mlwh(sess)
+        sess.close()
 
-    initialize_mlwh(sess)
+    try:
+        yield engine
+    finally:
+        engine.dispose()
 
-    yield sess
-    sess.close()
+
+@pytest.fixture(scope="function")
+def mlwh_session(mlwh_engine) -> Session:
+    """Returns an ML warehouse database session for testing. The session is
+    bound to a connection within an external transaction which is rolled back
+    when the test ends."""
+    connection = mlwh_engine.connect()
+    transaction = connection.begin()
+    sess = Session(bind=connection, autoflush=False, expire_on_commit=False)
+
+    try:
+        yield sess
+    finally:
+        sess.close()
+        transaction.rollback()
+        connection.close()
@@ -1,44 +1,68 @@
 import urllib
 from configparser import ConfigParser
-from pathlib import Path
+from typing import List
 from urllib.parse import quote
 
 import pytest
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy import create_engine, event, func, select
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+from sqlalchemy.pool import StaticPool
 from sqlalchemy_utils import database_exists, create_database, drop_database
 
+from tests.conftest import set_sqlite_pragmas, test_ini, xdist_worker
 from workbot import ConfigurationError
-from workbot.schema import WorkBotDBBase, initialize_database
+from workbot.enums import WorkState
+from workbot.schema import State, WorkBotDBBase
 
 
-@pytest.fixture(scope="function", params=["sqlite", "mysql"])
-def wb_session(request, config, tmp_path):
-    """Returns a WorkBot database session for testing."""
+def available_platforms() -> List[str]:
+    """Returns the names of the database platforms available for testing.
+    SQLite is always available, while MySQL is available only when it is
+    configured in the test ini file."""
+    test_config = ConfigParser()
+    test_config.read(test_ini)
 
-    url = None
+    platforms = ["sqlite"]
+    if "MySQL" in test_config.sections():
+        platforms.append("mysql")
+
+    return platforms
+
+
+@pytest.fixture(scope="session", params=available_platforms())
+def wb_engine(request, config):
+    """Returns a WorkBot database engine for testing. The schema is created
+    and initialized once per test session."""
+
+    engine = None
+    checkfirst = True
     if request.param == "mysql":
-        url = mysql_url(config)
+        engine = create_engine(mysql_url(config), echo=False)
+        # The schema, its tables and their State rows may remain from an
+        # earlier, interrupted session. They are reused: create_all checks
+        # for existing tables and initialize_states for existing States.
+        if not database_exists(engine.url):
+            create_database(engine.url)
     elif request.param == "sqlite":
-        url = sqlite_url(tmp_path)
+        # An in-memory database exists only as long as its connection, so
+        # all sessions share a single connection. It is created with the
+        # connection and has no tables to check for before creating them.
+        engine = create_engine(sqlite_url(), echo=False,
+                               connect_args={"check_same_thread": False},
+                               poolclass=StaticPool)
+        event.listen(engine, "connect", set_sqlite_pragmas)
+        checkfirst = False
     else:
         pytest.fail("Unknown database platform %s", request.param)
 
-    engine = create_engine(url, echo=False)
-    if not database_exists(engine.url):
-        create_database(engine.url)
-
-    WorkBotDBBase.metadata.create_all(engine)
-
-    session_maker = sessionmaker(bind=engine)
-    sess = session_maker()
-    initialize_database(sess)
-    sess.commit()
+    WorkBotDBBase.metadata.create_all(engine, checkfirst=checkfirst)
+    initialize_states(engine)
 
     try:
-        yield sess
+        yield engine
     finally:
-        sess.close()
+        engine.dispose()
 
         # This is for the benefit of MySQL where we have a schema reused for
         # a number of tests. Without using sqlalchemy-utils, one would call:
@@ -46,8 +70,46 @@ def wb_session(request, config, tmp_path):
         #   for t in reversed(meta.sorted_tables):
         #       t.drop(engine)
         #
-        # Dropping the database for SQLite deletes the SQLite file.
-        drop_database(engine.url)
+        # An in-memory SQLite database is discarded with its connection.
+        if request.param == "mysql":
+            drop_database(engine.url)
+
+
+def initialize_states(engine: Engine):
+    """Populates the State dictionary table of a test database with a
+    single Core insert, rather than through initialize_database's ORM unit
+    of work. The rows are taken from transient States so that their values
+    are those the State constructor gives them. If the table already has
+    rows, it is left unchanged."""
+    states = [State(ws) for ws in WorkState]
+    with engine.begin() as connection:
+        count = select([func.count()]).select_from(State.__table__)
+        if connection.execute(count).scalar():
+            return
+
+        connection.execute(State.__table__.insert(),
+                           [dict(name=s.name, desc=s.desc) for s in states])
+
+
+@pytest.fixture(scope="function")
+def wb_session(wb_engine) -> Session:
+    """Returns a WorkBot database session for testing.
+
+    The session is bound to a connection within an external transaction
+    which is rolled back when the test ends. Calls to commit() on the session
+    do not commit the external transaction, so every test sees the database
+    as it was initialized."""
+
+    connection = wb_engine.connect()
+    transaction = connection.begin()
+    sess = Session(bind=connection, autoflush=False, expire_on_commit=False)
+
+    try:
+        yield sess
+    finally:
+        sess.close()
+        transaction.rollback()
+        connection.close()
 
 
 def mysql_url(config: ConfigParser):
@@ -61,6 +123,11 @@ def mysql_url(config: ConfigParser):
     ip_address = <database IP address, defaults to "127.0.0.1">
     port       = <database port, defaults to 3306>
     schema     = <database schema, defaults to "workbot">
+
+    When the tests are run by pytest-xdist workers, e.g. with "pytest -n 4",
+    each worker's ID is appended to the schema name so that workers do not
+    share, or drop, each other's schema. In-memory SQLite databases are
+    already private to each worker process.
     """
     section = "MySQL"
 
@@ -75,13 +142,13 @@ def mysql_url(config: ConfigParser):
     ip_address = connection_conf.get("ip_address", "127.0.0.1")
     port = connection_conf.get("port", "3306")
     schema = connection_conf.get("schema", "workbot")
+    if xdist_worker():
+        schema = "{}_{}".format(schema, xdist_worker())
 
     return 'mysql+pymysql://{}:{}@{}:{}/{}'.format(user, password,
                                                    ip_address, port, schema)
 
 
-def sqlite_url(tmp_path: Path):
-    """Returns an SQLite URL configured to a temporary path."""
-    p = tmp_path / "workbot"
-    url = 'sqlite:///{}'.format(p)
-    return url
+def sqlite_url():
+    """Returns an SQLite URL for an in-memory database."""
+    return 'sqlite://'
@@ -4,35 +4,54 @@ from pathlib import PurePath
 import pytest
 from pytest import mark as m
 
-from tests.irods_fixture import baton_session, irods_gridion
+from tests.irods_fixture import GRIDION_FINAL_SUMMARY, GRIDION_RUN, \
+    GRIDION_RUN_METADATA, baton_session, fresh_baton_client, irods_gridion, \
+    irods_gridion_annotated, irods_gridion_master, irods_gridion_meta, \
+    irods_gridion_shared, irods_test_root
 from workbot.irods import AVU, AC, BatonClient, Collection, \
     DataObject, Permission, RodsError
 
 #  Stop IDEs "optimizing" away these imports
 _ = irods_gridion
 _ = baton_session
+_ = irods_test_root
+_ = irods_gridion_master
+_ = fresh_baton_client
+_ = irods_gridion_annotated
+_ = irods_gridion_meta
+_ = irods_gridion_shared
 
 
 @m.describe("BatonClient")
 class TestBatonClient(object):
     @m.context("When created")
     @m.it("Is not running")
-    def test_create_baton_client(self):
-        client = BatonClient()
-        assert not client.is_running()
+    def test_create_baton_client(self, fresh_baton_client):
+        assert not fresh_baton_client.is_running()
 
     @m.it("Can be started and stopped")
-    def test_start_baton_client(self):
-        client = BatonClient()
+    def test_start_baton_client(self, fresh_baton_client):
+        client = fresh_baton_client
         client.start()
         assert client.is_running()
         client.stop()
         assert not client.is_running()
 
+    @m.it("Can be stopped more than once")
+    def test_stop_baton_client(self, fresh_baton_client):
+        client = fresh_baton_client
+        client.stop()
+        assert not client.is_running()
+        client.start()
+        client.stop()
+        client.stop()
+        assert not client.is_running()
+
     @m.context("When stopped")
     @m.it("Can be re-started")
-    def test_restart_baton_client(self, irods_gridion):
-        client = BatonClient()
+    def test_restart_baton_client(self, fresh_baton_client,
+                                  irods_gridion_master):
+        client = fresh_baton_client
         client.start()
         assert client.is_running()
         client.stop()
@@ -41,34 +60,31 @@ class TestBatonClient(object):
         client.start()
         assert client.is_running()
         # Try an operation
-        coll = Collection(client, irods_gridion)
+        coll = Collection(client, irods_gridion_master)
         assert coll.exists()
-        client.stop()
 
     @m.context("When running")
     @m.it("Can list a collection (non-recursively)")
-    def test_list_collection(self, irods_gridion, baton_session):
-        coll = Collection(baton_session, irods_gridion)
-        assert coll.list() == Collection(baton_session, irods_gridion)
+    def test_list_collection(self, irods_gridion_master, baton_session):
+        coll = Collection(baton_session, irods_gridion_master)
+        assert coll.list() == Collection(baton_session, irods_gridion_master)
 
         coll = Collection(baton_session, "/no/such/collection")
         with pytest.raises(RodsError, match="does not exist"):
             coll.list()
 
     @m.it("Can list collection contents")
-    def test_list_collection_contents(self, irods_gridion, baton_session):
-        p = PurePath(irods_gridion, "66", "DN585561I_A1",
-                     "20190904_1514_GA20000_FAL01979_43578c8f")
+    def test_list_collection_contents(self, irods_gridion_master,
+                                      baton_session):
+        p = PurePath(irods_gridion_master, GRIDION_RUN)
 
         coll = Collection(baton_session, p)
         contents = coll.contents()
         assert len(contents) == 11
 
     @m.it("Can list a data object")
-    def test_list_data_object(self, irods_gridion, baton_session):
-        p = PurePath(irods_gridion, "66", "DN585561I_A1",
-                     "20190904_1514_GA20000_FAL01979_43578c8f",
-                     "final_summary.txt")
+    def test_list_data_object(self, irods_gridion_master, baton_session):
+        p = PurePath(irods_gridion_master, GRIDION_FINAL_SUMMARY)
 
         obj = DataObject(baton_session, p)
         assert obj.list() == DataObject(baton_session, p)
@@ -78,18 +94,16 @@ class TestBatonClient(object):
             obj.list()
 
     @m.it("Can test existence of a collection")
-    def test_exists_collection(self, irods_gridion, baton_session):
-        coll = Collection(baton_session, irods_gridion)
+    def test_exists_collection(self, irods_gridion_master, baton_session):
+        coll = Collection(baton_session, irods_gridion_master)
         assert coll.exists()
 
         coll = Collection(baton_session, "/no/such/collection")
         assert not coll.exists()
 
     @m.it("Can test existence of a data object")
-    def test_exists_data_object(self, irods_gridion, baton_session):
-        p = PurePath(irods_gridion, "66", "DN585561I_A1",
-                     "20190904_1514_GA20000_FAL01979_43578c8f",
-                     "final_summary.txt")
+    def test_exists_data_object(self, irods_gridion_master, baton_session):
+        p = PurePath(irods_gridion_master, GRIDION_FINAL_SUMMARY)
 
         obj = DataObject(baton_session, p)
         assert obj.exists()
@@ -98,80 +112,149 @@ class TestBatonClient(object):
         assert not obj.exists()
 
     @m.it("Can add metadata to a collection")
-    def test_meta_add_collection(self, irods_gridion, baton_session):
-        p = PurePath(irods_gridion, "66", "DN585561I_A1",
-                     "20190904_1514_GA20000_FAL01979_43578c8f")
+    def test_meta_add_collection(self, irods_gridion_meta, baton_session):
+        p = PurePath(irods_gridion_meta, GRIDION_RUN)
         coll = Collection(baton_session, p)
-        assert coll.metadata() == []
-
-        avu1 = AVU("abcde", "12345")
-        avu2 = AVU("vwxyz", "567890")
 
+        # Attributes unique to this test, so the AVUs are new
+        avu1 = AVU("test_meta_add_collection", "1")
+        avu2 = AVU("test_meta_add_collection", "2")
         assert coll.meta_add(avu1, avu2) == 2
-        assert avu1 in coll.metadata()
-        assert avu2 in coll.metadata()
+
+        metadata = coll.metadata()
+        assert avu1 in metadata
+        assert avu2 in metadata
 
         assert coll.meta_add(avu1, avu2) == 0, \
             "adding collection metadata is idempotent"
 
+    @m.it("Can test for metadata on a collection")
+    def test_has_metadata_collection(self, irods_gridion_annotated,
+                                     baton_session):
+        p = PurePath(irods_gridion_annotated, GRIDION_RUN)
+        coll = Collection(baton_session, p)
+
+        avu1, avu2 = GRIDION_RUN_METADATA
+        assert coll.has_metadata(avu1)
+        assert coll.has_metadata(avu1, avu2)
+        assert not coll.has_metadata(avu1, AVU("abcde", "99999")), \
+            "all the AVUs must be present"
+
+    @m.it("Can list the metadata of collection contents")
+    def test_contents_metadata_collection(self, irods_gridion_annotated,
+                                          baton_session):
+        p = PurePath(irods_gridion_annotated, GRIDION_RUN)
+        coll = Collection(baton_session, p)
+
+        metadata = coll.contents_metadata()
+        assert len(metadata) == len(coll.contents())
+        assert metadata[PurePath(irods_gridion_annotated,
+                                 GRIDION_FINAL_SUMMARY)] == \
+            sorted(GRIDION_RUN_METADATA)
+        assert metadata[PurePath(p, "report.md")] == []
+
+    @m.it("Can add metadata to many collections at once")
+    def test_meta_add_bulk_collection(self, irods_gridion_meta, baton_session):
+        p2 = PurePath(irods_gridion_meta, GRIDION_RUN)
+        p1 = p2.parent
+        avu1 = AVU("abcde", "12345")
+        avu2 = AVU("vwxyz", "567890")
+
+        baton_session.meta_add_bulk([{BatonClient.COLL: p1,
+                                      BatonClient.AVUS: [avu1]},
+                                     {BatonClient.COLL: p2,
+                                      BatonClient.AVUS: [avu1, avu2]}])
+        assert Collection(baton_session, p1).metadata() == [avu1]
+        assert Collection(baton_session, p2).metadata() == [avu1, avu2]
+
+    @m.it("Can add metadata to many collections in several batches")
+    def test_meta_add_bulk_collection_batched(self, irods_gridion_meta,
+                                              fresh_baton_client):
+        p2 = PurePath(irods_gridion_meta, GRIDION_RUN)
+        p1 = p2.parent
+        avus = [AVU("batch", str(i)) for i in range(10)]
+
+        # Small enough to send each request in a batch of its own
+        fresh_baton_client.MAX_PIPELINE_BYTES = 64
+        fresh_baton_client.meta_add_bulk([{BatonClient.COLL: p,
+                                           BatonClient.AVUS: [avu]}
+                                          for avu in avus for p in [p1, p2]])
+        assert Collection(fresh_baton_client, p1).metadata() == sorted(avus)
+        assert Collection(fresh_baton_client, p2).metadata() == sorted(avus)
+
+    @m.it("Raises an exception adding metadata already present in bulk")
+    def test_meta_add_bulk_collection_present(self, irods_gridion_meta,
+                                              baton_session):
+        p2 = PurePath(irods_gridion_meta, GRIDION_RUN)
+        p1 = p2.parent
+        avu1 = AVU("abcde", "12345")
+        avu2 = AVU("vwxyz", "567890")
+
+        coll = Collection(baton_session, p2)
+        assert coll.meta_add(avu1) == 1
+
+        # Existing AVUs are not filtered out, unlike RodsItem.meta_add
+        with pytest.raises(RodsError):
+            baton_session.meta_add_bulk([{BatonClient.COLL: p1,
+                                          BatonClient.AVUS: [avu1]},
+                                         {BatonClient.COLL: p2,
+                                          BatonClient.AVUS: [avu1, avu2]}])
+
+        # The other items are still processed
+        assert Collection(baton_session, p1).metadata() == [avu1]
+
     @m.it("Can remove metadata from a collection")
-    def test_meta_rem_collection(self, irods_gridion, baton_session):
-        p = PurePath(irods_gridion, "66", "DN585561I_A1",
-                     "20190904_1514_GA20000_FAL01979_43578c8f")
+    def test_meta_rem_collection(self, irods_gridion_meta, baton_session):
+        p = PurePath(irods_gridion_meta, GRIDION_RUN)
         coll = Collection(baton_session, p)
-        assert coll.metadata() == []
 
         avu1 = AVU("abcde", "12345")
         avu2 = AVU("vwxyz", "567890")
-        coll.meta_add(avu1, avu2)
+        assert coll.meta_add(avu1, avu2) == 2
 
         assert coll.meta_remove(avu1, avu2) == 2
-        assert avu1 not in coll.metadata()
-        assert avu2 not in coll.metadata()
+        metadata = coll.metadata()
+        assert avu1 not in metadata
+        assert avu2 not in metadata
         assert coll.meta_remove(avu1, avu2) == 0, \
             "removing collection metadata is idempotent"
 
     @m.it("Can add metadata to a data object")
-    def test_meta_add_data_object(self, irods_gridion, baton_session):
-        p = PurePath(irods_gridion, "66", "DN585561I_A1",
-                     "20190904_1514_GA20000_FAL01979_43578c8f",
-                     "final_summary.txt")
+    def test_meta_add_data_object(self, irods_gridion_meta, baton_session):
+        p = PurePath(irods_gridion_meta, GRIDION_FINAL_SUMMARY)
         obj = DataObject(baton_session, p)
-        assert obj.metadata() == []
 
-        avu1 = AVU("abcde", "12345")
-        avu2 = AVU("vwxyz", "567890")
+        # Attributes unique to this test, so the AVUs are new
+        avu1 = AVU("test_meta_add_data_object", "1")
+        avu2 = AVU("test_meta_add_data_object", "2")
+        assert obj.meta_add(avu1, avu2) == 2
 
-        obj.meta_add(avu1, avu2)
-        assert avu1 in obj.metadata()
-        assert avu2 in obj.metadata()
+        metadata = obj.metadata()
+        assert avu1 in metadata
+        assert avu2 in metadata
 
         assert obj.meta_add(avu1, avu2) == 0, \
             "adding data object metadata is idempotent"
 
     @m.it("Can remove metadata from a data object")
-    def test_meta_rem_data_object(self, irods_gridion, baton_session):
-        p = PurePath(irods_gridion, "66", "DN585561I_A1",
-                     "20190904_1514_GA20000_FAL01979_43578c8f",
-                     "final_summary.txt")
+    def test_meta_rem_data_object(self, irods_gridion_meta, baton_session):
+        p = PurePath(irods_gridion_meta, GRIDION_FINAL_SUMMARY)
         obj = DataObject(baton_session, p)
-        assert obj.metadata() == []
 
         avu1 = AVU("abcde", "12345")
         avu2 = AVU("vwxyz", "567890")
-        obj.meta_add(avu1, avu2)
+        assert obj.meta_add(avu1, avu2) == 2
 
         assert obj.meta_remove(avu1, avu2) == 2
-        assert avu1 not in obj.metadata()
-        assert avu2 not in obj.metadata()
+        metadata = obj.metadata()
+        assert avu1 not in metadata
+        assert avu2 not in metadata
         assert obj.meta_remove(avu1, avu2) == 0, \
             "removing data object metadata is idempotent"
 
     @m.it("Can replace metadata on a data object")
-    def test_meta_rep_data_object(self, irods_gridion, baton_session):
-        p = PurePath(irods_gridion, "66", "DN585561I_A1",
-                     "20190904_1514_GA20000_FAL01979_43578c8f",
-                     "final_summary.txt")
+    def test_meta_rep_data_object(self, irods_gridion_meta, baton_session):
+        p = PurePath(irods_gridion_meta, GRIDION_FINAL_SUMMARY)
         obj = DataObject(baton_session, p)
         assert obj.metadata() == []
 
@@ -207,39 +290,28 @@ class TestBatonClient(object):
         assert obj.metadata() == expected
 
     @m.it("Can find a collection by its metadata")
-    def test_meta_query_collection(self, irods_gridion, baton_session):
-        p = PurePath(irods_gridion, "66", "DN585561I_A1",
-                     "20190904_1514_GA20000_FAL01979_43578c8f")
-        coll = Collection(baton_session, p)
-
-        avu = AVU("abcde", "12345")
-        coll.meta_add(avu)
-        assert coll.metadata() == [avu]
+    def test_meta_query_collection(self, irods_gridion_annotated,
+                                   baton_session):
+        p = PurePath(irods_gridion_annotated, GRIDION_RUN)
 
+        avu = GRIDION_RUN_METADATA[0]
         found = baton_session.meta_query([avu], collection=True,
-                                         zone=irods_gridion)
+                                         zone=irods_gridion_annotated)
         assert found == [Collection(baton_session, p)]
 
     @m.it("Can find a data object by its metadata")
-    def test_meta_query_data_object(self, irods_gridion, baton_session):
-        p = PurePath(irods_gridion, "66", "DN585561I_A1",
-                     "20190904_1514_GA20000_FAL01979_43578c8f",
-                     "final_summary.txt")
-        obj = DataObject(baton_session, p)
-
-        avu = AVU("abcde", "12345")
-        obj.meta_add(avu)
-        assert obj.metadata() == [avu]
+    def test_meta_query_data_object(self, irods_gridion_annotated,
+                                    baton_session):
+        p = PurePath(irods_gridion_annotated, GRIDION_FINAL_SUMMARY)
 
+        avu = GRIDION_RUN_METADATA[0]
         found = baton_session.meta_query([avu], data_object=True,
-                                         zone=irods_gridion)
+                                         zone=irods_gridion_annotated)
         assert found == [DataObject(baton_session, p)]
 
     @m.it("Can add access control to a data object")
     def test_add_ac_data_object(self, irods_gridion, baton_session):
-        p = PurePath(irods_gridion, "66", "DN585561I_A1",
-                     "20190904_1514_GA20000_FAL01979_43578c8f",
-                     "final_summary.txt")
+        p = PurePath(irods_gridion, GRIDION_FINAL_SUMMARY)
 
         obj = DataObject(baton_session, p)
         assert obj.acl() == [AC("irods", Permission.OWN, zone="testZone")]
@@ -254,9 +326,7 @@ class TestBatonClient(object):
 
     @m.it("Can remove access control from a data object")
     def test_rem_ac_data_object(self, irods_gridion, baton_session):
-        p = PurePath(irods_gridion, "66", "DN585561I_A1",
-                     "20190904_1514_GA20000_FAL01979_43578c8f",
-                     "final_summary.txt")
+        p = PurePath(irods_gridion, GRIDION_FINAL_SUMMARY)
 
         obj = DataObject(baton_session, p)
         assert obj.acl() == [AC("irods", Permission.OWN, zone="testZone")]
@@ -276,7 +346,7 @@ class TestBatonClient(object):
 @m.describe("AC")
 class TestAC(object):
     @m.describe("Comparison")
-    def test_compare_acs_equal(self, irods_gridion):
+    def test_compare_acs_equal(self):
         assert AC("irods", Permission.OWN, zone="testZone") == \
                AC("irods", Permission.OWN, zone="testZone")
 
@@ -365,8 +435,8 @@ class TestCollection(object):
     @m.describe("Support for str path")
     @m.context("When a Collection is made from a str path")
     @m.it("Can be created")
-    def test_make_collection_str(self, irods_gridion, baton_session):
-        p = PurePath(irods_gridion)
+    def test_make_collection_str(self, irods_gridion_master, baton_session):
+        p = PurePath(irods_gridion_master)
         coll = Collection(baton_session, p.as_posix())
 
         assert coll.exists()
@@ -375,8 +445,9 @@ class TestCollection(object):
     @m.describe("Support for pathlib.Path")
     @m.context("When a Collection is made from a pathlib.Path")
     @m.it("Can be created")
-    def test_make_collection_pathlib(self, irods_gridion, baton_session):
-        p = PurePath(irods_gridion)
+    def test_make_collection_pathlib(self, irods_gridion_master,
+                                     baton_session):
+        p = PurePath(irods_gridion_master)
         coll = Collection(baton_session, p)
 
         assert coll.exists()
@@ -387,10 +458,8 @@ class TestCollection(object):
 class TestDataObject(object):
     @m.context("When a DataObject is made from a str path")
     @m.it("Can be created")
-    def test_make_data_object_str(self, irods_gridion, baton_session):
-        p = PurePath(irods_gridion, "66", "DN585561I_A1",
-                     "20190904_1514_GA20000_FAL01979_43578c8f",
-                     "final_summary.txt")
+    def test_make_data_object_str(self, irods_gridion_master, baton_session):
+        p = PurePath(irods_gridion_master, GRIDION_FINAL_SUMMARY)
         obj = DataObject(baton_session, p.as_posix())
 
         assert obj.exists()
@@ -399,10 +468,9 @@ class TestDataObject(object):
 
     @m.context("When a DataObject is made from a pathlib.Path")
     @m.it("Can be created")
-    def test_make_data_object_pathlib(self, irods_gridion, baton_session):
-        p = PurePath(irods_gridion, "66", "DN585561I_A1",
-                     "20190904_1514_GA20000_FAL01979_43578c8f",
-                     "final_summary.txt")
+    def test_make_data_object_pathlib(self, irods_gridion_master,
+                                      baton_session):
+        p = PurePath(irods_gridion_master, GRIDION_FINAL_SUMMARY)
         obj = DataObject(baton_session, p)
 
         assert obj.exists()
@@ -1,27 +1,39 @@
 import os
+from collections import Counter
 from datetime import datetime
 from pathlib import Path, PurePath
 
 import pytest
 from pytest import mark as m
 
-from tests.irods_fixture import baton_session, irods_gridion, irods_synthetic
-from tests.ml_warehouse_fixture import mlwh_session
-from tests.schema_fixture import wb_session
+from tests.irods_fixture import GRIDION_RUN, baton_session, irods_gridion, \
+    irods_gridion_master, irods_synthetic, irods_synthetic_master, \
+    irods_test_root
+from tests.ml_warehouse_fixture import latest_expt_positions, mlwh_engine, \
+    mlwh_session
+from tests.schema_fixture import wb_engine, wb_session
 from workbot.base import AnalysisError
 from workbot.enums import WorkState, WorkType
-from workbot.irods import AVU, Collection, imkdir, iput
+from workbot.irods import AVU, Collection, icp, imkdir
 from workbot.ml_warehouse_schema import find_recent_ont_pos
 from workbot.ont import ONTRunDataWorkBot, ONTWorkBroker
 from workbot.schema import WorkInstance
 
 #  Stop IDEs "optimizing" away these imports
+_ = mlwh_engine
 _ = mlwh_session
+_ = wb_engine
 _ = wb_session
 
 _ = irods_gridion
 _ = irods_synthetic
 _ = baton_session
+_ = irods_test_root
+_ = irods_gridion_master
+_ = irods_synthetic_master
+
+# The work type name used throughout these tests
+_ARTIC_NAME = WorkType.ARTICNextflow.name
 
 
 @m.describe("ONTRunDataWorkBot")
@@ -29,19 +41,19 @@ class TestONTRunDataWorkBot(object):
     @m.context("When created")
     @m.it("Has the correct work type")
     def test_make_workbot_ont_run_data_worktype(self):
-        work_type = WorkType.ARTICNextflow.name
+        work_type = _ARTIC_NAME
         assert ONTRunDataWorkBot(work_type).work_type == work_type
 
     @m.context("When a work type is set")
     @m.it("Appears in its compatible worktypes")
     def test_make_compatible_worktypes(self):
-        work_type = WorkType.ARTICNextflow.name
+        work_type = _ARTIC_NAME
         assert work_type in ONTRunDataWorkBot(work_type). \
             compatible_work_types()
 
     @m.it("Can be requeued until cancelled or completed")
     def test_make_workbot_ont_run_data_endstate(self):
-        work_type = WorkType.ARTICNextflow.name
+        work_type = _ARTIC_NAME
         assert ONTRunDataWorkBot(work_type). \
             end_states == [WorkState.CANCELLED, WorkState.COMPLETED]
 
@@ -56,37 +68,36 @@ class TestONTRunDataWorkBot(object):
 
         # Check precondition of test
         expts = find_recent_ont_pos(mlwh_session, start_date)
-        assert expts == [('multiplexed_experiment_001', 1),
-                         ('multiplexed_experiment_001', 3),
-                         ('multiplexed_experiment_001', 5),
-                         ('multiplexed_experiment_003', 1),
-                         ('multiplexed_experiment_003', 3),
-                         ('multiplexed_experiment_003', 5)]
-
-        br = ONTWorkBroker(ONTRunDataWorkBot(WorkType.ARTICNextflow.name))
+        assert Counter(expts) == Counter(latest_expt_positions())
+
+        # The search is limited to this test's copy of the data, which
+        # has the same metadata as the copies of any other test workers
+        br = ONTWorkBroker(ONTRunDataWorkBot(_ARTIC_NAME))
         num_added = br.request_work(wb_session=wb_session,
                                     mlwh_session=mlwh_session,
-                                    start_date=start_date)
+                                    start_date=start_date,
+                                    zone=irods_synthetic)
         assert num_added == 1  # Only one experiment has reached iRODS
 
-        wis = wb_session.query(WorkInstance).all()
-        assert len(wis) == 1
-        assert wis[0].input_path == p
-        assert wis[0].state.name == WorkState.PENDING
+        wi = wb_session.query(WorkInstance).one()
+        assert wi.input_path == p
+        assert wi.state.name == WorkState.PENDING
 
         # One analysis exists, so another should not be added
         num_added = br.request_work(wb_session=wb_session,
                                     mlwh_session=mlwh_session,
-                                    start_date=start_date)
+                                    start_date=start_date,
+                                    zone=irods_synthetic)
         assert num_added == 0
 
     @m.context("When ONT analysis input data are complete")
     @m.it("Is detected")
-    def test_is_ont_input_data_complete(self, wb_session, irods_gridion):
+    def test_is_ont_input_data_complete(self, wb_session, irods_gridion,
+                                        irods_gridion_master):
         archive_root = "/dummy"
         staging_root = "/dummy"
 
-        wb = ONTRunDataWorkBot(WorkType.ARTICNextflow.name,
+        wb = ONTRunDataWorkBot(_ARTIC_NAME,
                                archive_root=archive_root,
                                staging_root=staging_root)
         p = Path(irods_gridion, "dummy_input")
@@ -96,9 +107,9 @@ class TestONTRunDataWorkBot(object):
         imkdir(p, make_parents=True)
         assert not wb.is_input_data_complete(wi)
 
-        iput("tests/data/gridion/66/DN585561I_A1/"
-             "20190904_1514_GA20000_FAL01979_43578c8f/final_report.txt.gz",
-             Path(p, "final_report.txt.gz"))
+        # The report is already in iRODS, so a server-side copy will do
+        icp(PurePath(irods_gridion_master, GRIDION_RUN, "final_report.txt.gz"),
+            Path(p, "final_report.txt.gz"))
         assert wb.is_input_data_complete(wi)
 
     @m.context("When analysis input data are staged")
@@ -108,11 +119,10 @@ class TestONTRunDataWorkBot(object):
         imkdir(archive_root, make_parents=True)
         staging_root = tmp_path / "staging"
 
-        wb = ONTRunDataWorkBot(WorkType.ARTICNextflow.name,
+        wb = ONTRunDataWorkBot(_ARTIC_NAME,
                                archive_root=archive_root,
                                staging_root=staging_root)
-        p = Path(irods_gridion, "66", "DN585561I_A1",
-                 "20190904_1514_GA20000_FAL01979_43578c8f")
+        p = Path(irods_gridion, GRIDION_RUN)
         wi = wb.add_work(wb_session, p)
 
         assert not wi.is_staged()
@@ -137,8 +147,10 @@ class TestONTRunDataWorkBot(object):
                           "report.md",
                           "report.pdf",
                           "throughput.csv"]
-        for f in expected_files:
-            assert Path(staging_in_path, f).exists()
+        with os.scandir(staging_in_path) as entries:
+            present = {entry.name for entry in entries}
+        missing = set(expected_files) - present
+        assert not missing, "missing {}".format(sorted(missing))
 
     @m.describe("Running analyses")
     @m.context("When an ONT analysis is run")
@@ -148,11 +160,10 @@ class TestONTRunDataWorkBot(object):
         imkdir(archive_root, make_parents=True)
         staging_root = tmp_path / "staging"
 
-        wb = ONTRunDataWorkBot(WorkType.ARTICNextflow.name,
+        wb = ONTRunDataWorkBot(_ARTIC_NAME,
                                archive_root=archive_root,
                                staging_root=staging_root)
-        p = Path(irods_gridion, "66", "DN585561I_A1",
-                 "20190904_1514_GA20000_FAL01979_43578c8f")
+        p = Path(irods_gridion, GRIDION_RUN)
         wi = wb.add_work(wb_session, p)
         wb.stage_input_data(wb_session, wi)
 
@@ -164,8 +175,10 @@ class TestONTRunDataWorkBot(object):
         assert staging_out_path == Path(staging_root, str(wi.id), "output")
 
         expected_files = ["ncov2019-artic-nf-done"]
-        for f in expected_files:
-            assert Path(os.path.join(staging_out_path, f)).exists()
+        with os.scandir(staging_out_path) as entries:
+            present = {entry.name for entry in entries}
+        missing = set(expected_files) - present
+        assert not missing, "missing {}".format(sorted(missing))
 
     @m.describe("Post-analysis")
     @m.context("When an ONT analysis is archived")
@@ -175,11 +188,10 @@ class TestONTRunDataWorkBot(object):
         imkdir(archive_root, make_parents=True)
         staging_root = tmp_path / "staging"
 
-        wb = ONTRunDataWorkBot(WorkType.ARTICNextflow.name,
+        wb = ONTRunDataWorkBot(_ARTIC_NAME,
                                archive_root=archive_root,
                                staging_root=staging_root)
-        p = Path(irods_gridion, "66", "DN585561I_A1",
-                 "20190904_1514_GA20000_FAL01979_43578c8f")
+        p = Path(irods_gridion, GRIDION_RUN)
         wi = wb.add_work(wb_session, p)
         wb.add_metadata(wb_session, wi,
                         experiment_name="experiment_01",
@@ -200,14 +212,13 @@ class TestONTRunDataWorkBot(object):
         imkdir(archive_root, make_parents=True)
         staging_root = tmp_path / "staging"
 
-        expt = "66"
+        expt = GRIDION_RUN.parts[0]
         pos = 2
 
-        wb = ONTRunDataWorkBot(WorkType.ARTICNextflow.name,
+        wb = ONTRunDataWorkBot(_ARTIC_NAME,
                                archive_root=archive_root,
                                staging_root=staging_root)
-        p = Path(irods_gridion, expt, "DN585561I_A1",
-                 "20190904_1514_GA20000_FAL01979_43578c8f")
+        p = Path(irods_gridion, GRIDION_RUN)
         wi = wb.add_work(wb_session, p)
         wb.add_metadata(wb_session, wi,
                         experiment_name=expt,
@@ -222,8 +233,8 @@ class TestONTRunDataWorkBot(object):
 
         archive_path = wb.archive_path(wi)
         coll = Collection(baton_session, archive_path)
-        assert AVU("experiment_name", expt, namespace="ont") in coll.metadata()
-        assert AVU("instrument_slot", pos, namespace="ont") in coll.metadata()
+        assert coll.has_metadata(AVU("experiment_name", expt, namespace="ont"),
+                                 AVU("instrument_slot", pos, namespace="ont"))
 
     @m.context("When an ONT analysis is unstaged")
     @m.it("Removes the local staging directory")
@@ -233,11 +244,10 @@ class TestONTRunDataWorkBot(object):
         imkdir(archive_root, make_parents=True)
         staging_root = tmp_path / "staging"
 
-        wb = ONTRunDataWorkBot(WorkType.ARTICNextflow.name,
+        wb = ONTRunDataWorkBot(_ARTIC_NAME,
                                archive_root=archive_root,
                                staging_root=staging_root)
-        p = Path(irods_gridion, "66", "DN585561I_A1",
-                 "20190904_1514_GA20000_FAL01979_43578c8f")
+        p = Path(irods_gridion, GRIDION_RUN)
         wi = wb.add_work(wb_session, p)
 
         wb.stage_input_data(wb_session, wi)
@@ -254,15 +264,14 @@ class TestONTRunDataWorkBot(object):
     @m.it("Can be completed")
     def test_complete_analysis(self, wb_session, irods_gridion, tmp_path,
                                baton_session):
-        archive_root = os.path.join(irods_gridion, "archive")
+        archive_root = Path(irods_gridion, "archive")
         imkdir(archive_root, make_parents=True)
         staging_root = tmp_path / "staging"
 
-        wb = ONTRunDataWorkBot(WorkType.ARTICNextflow.name,
+        wb = ONTRunDataWorkBot(_ARTIC_NAME,
                                archive_root=archive_root,
                                staging_root=staging_root)
-        p = Path(irods_gridion, "66", "DN585561I_A1",
-                 "20190904_1514_GA20000_FAL01979_43578c8f")
+        p = Path(irods_gridion, GRIDION_RUN)
         wi = wb.add_work(wb_session, p)
 
         wb.stage_input_data(wb_session, wi)
@@ -279,17 +288,16 @@ class TestONTRunDataWorkBot(object):
     @m.it("Cannot be re-run")
     def test_rerun_completed_analysis(self, wb_session, irods_gridion,
                                       tmp_path, baton_session):
-        archive_root = os.path.join(irods_gridion, "archive")
+        archive_root = Path(irods_gridion, "archive")
         imkdir(archive_root, make_parents=True)
         staging_root = tmp_path / "staging"
 
-        wb = ONTRunDataWorkBot(WorkType.ARTICNextflow.name,
+        wb = ONTRunDataWorkBot(_ARTIC_NAME,
                                archive_root=archive_root,
                                staging_root=staging_root)
         assert wb.end_states == [WorkState.CANCELLED, WorkState.COMPLETED]
 
-        p = Path(irods_gridion, "66", "DN585561I_A1",
-                 "20190904_1514_GA20000_FAL01979_43578c8f")
+        p = Path(irods_gridion, GRIDION_RUN)
         wi = wb.add_work(wb_session, p)
         wb.run(wb_session, wi)
 
@@ -301,17 +309,16 @@ class TestONTRunDataWorkBot(object):
     @m.it("Cannot be re-run")
     def test_rerun_cancelled_analysis(self, wb_session, irods_gridion,
                                       tmp_path, baton_session):
-        archive_root = os.path.join(irods_gridion, "archive")
+        archive_root = Path(irods_gridion, "archive")
         imkdir(archive_root, make_parents=True)
         staging_root = tmp_path / "staging"
 
-        wb = ONTRunDataWorkBot(WorkType.ARTICNextflow.name,
+        wb = ONTRunDataWorkBot(_ARTIC_NAME,
                                archive_root=archive_root,
                                staging_root=staging_root)
         assert wb.end_states == [WorkState.CANCELLED, WorkState.COMPLETED]
 
-        p = Path(irods_gridion, "66", "DN585561I_A1",
-                 "20190904_1514_GA20000_FAL01979_43578c8f")
+        p = Path(irods_gridion, GRIDION_RUN)
         wi = wb.add_work(wb_session, p)
         wb.cancel_analysis(wb_session, wi)
 
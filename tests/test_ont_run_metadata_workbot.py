@@ -1,26 +1,37 @@
+from collections import Counter
 from datetime import datetime
 from pathlib import PurePath
 
 import pytest
 from pytest import mark as m
 
-from tests.irods_fixture import baton_session, irods_synthetic, \
+from tests.irods_fixture import baton_session, irods_admin, \
+    irods_synthetic, irods_synthetic_master, irods_test_root, \
     tests_have_admin
-from tests.ml_warehouse_fixture import mlwh_session
-from tests.schema_fixture import wb_session
+from tests.ml_warehouse_fixture import latest_expt_positions, mlwh_engine, \
+    mlwh_session
+from tests.schema_fixture import wb_engine, wb_session
 from workbot.base import AnalysisError
 from workbot.enums import WorkState, WorkType
 from workbot.irods import AC, AVU, Collection, Permission
 from workbot.ml_warehouse_schema import find_recent_ont_pos
-from workbot.ont import ONTRunMetadataWorkBot, ONTWorkBroker
+from workbot.ont import ONTRunMetadataWorkBot, ONTWorkBroker, barcode_name
 from workbot.schema import WorkInstance
 
 #  Stop IDEs "optimizing" away these imports
+_ = mlwh_engine
 _ = mlwh_session
+_ = wb_engine
 _ = wb_session
 
 _ = irods_synthetic
 _ = baton_session
+_ = irods_test_root
+_ = irods_synthetic_master
+_ = irods_admin
+
+# The work type name used throughout these tests
+_UPDATE_NAME = WorkType.ONTRunMetadataUpdate.name
 
 
 @m.describe("ONTRunMetadataWorkBot")
@@ -28,17 +39,23 @@ class TestONTRunMetadataWorkBot(object):
     @m.context("When created")
     @m.it("Can be re-queued until cancelled")
     def test_make_workbot_ont_run_data_endstate(self):
-        work_type = WorkType.ONTRunMetadataUpdate.name
+        work_type = _UPDATE_NAME
         assert ONTRunMetadataWorkBot(work_type). \
             end_states == [WorkState.CANCELLED]
 
     @m.context("When a work type is set")
     @m.it("Appears in its compatible worktypes")
     def test_make_compatible_worktypes(self):
-        work_type = WorkType.ONTRunMetadataUpdate.name
+        work_type = _UPDATE_NAME
         assert work_type in ONTRunMetadataWorkBot(work_type). \
             compatible_work_types()
 
+    @m.context("When a tag index is given")
+    @m.it("Names the barcode sub-collection in ONT style")
+    def test_barcode_name(self):
+        assert barcode_name(1) == "barcode01"
+        assert barcode_name(12) == "barcode12"
+
     @m.context("When ONT experiments are found")
     @m.it("Adds analyses for new ones in a PENDING state")
     def test_add_new_updates(self, mlwh_session, wb_session,
@@ -50,29 +67,26 @@ class TestONTRunMetadataWorkBot(object):
 
         # Check precondition of test
         expts = find_recent_ont_pos(mlwh_session, start_date)
-        assert expts == [('multiplexed_experiment_001', 1),
-                         ('multiplexed_experiment_001', 3),
-                         ('multiplexed_experiment_001', 5),
-                         ('multiplexed_experiment_003', 1),
-                         ('multiplexed_experiment_003', 3),
-                         ('multiplexed_experiment_003', 5)]
-
-        wt = WorkType.ONTRunMetadataUpdate.name
-        br = ONTWorkBroker(ONTRunMetadataWorkBot(wt))
+        assert Counter(expts) == Counter(latest_expt_positions())
+
+        # The search is limited to this test's copy of the data, which
+        # has the same metadata as the copies of any other test workers
+        br = ONTWorkBroker(ONTRunMetadataWorkBot(_UPDATE_NAME))
         num_added = br.request_work(wb_session=wb_session,
                                     mlwh_session=mlwh_session,
-                                    start_date=start_date)
+                                    start_date=start_date,
+                                    zone=irods_synthetic)
         assert num_added == 1  # Only one experiment has reached iRODS
 
-        wis = wb_session.query(WorkInstance).all()
-        assert len(wis) == 1
-        assert wis[0].input_path == p
-        assert wis[0].state.name == WorkState.PENDING
+        wi = wb_session.query(WorkInstance).one()
+        assert wi.input_path == p
+        assert wi.state.name == WorkState.PENDING
 
         # One update exists, so another should not be added
         num_added = br.request_work(wb_session=wb_session,
                                     mlwh_session=mlwh_session,
-                                    start_date=start_date)
+                                    start_date=start_date,
+                                    zone=irods_synthetic)
         assert num_added == 0
 
     @tests_have_admin
@@ -84,8 +98,7 @@ class TestONTRunMetadataWorkBot(object):
         expt = "simple_experiment_001"
         pos = 1
 
-        wt = WorkType.ONTRunMetadataUpdate.name
-        wb = ONTRunMetadataWorkBot(wt)
+        wb = ONTRunMetadataWorkBot(_UPDATE_NAME)
         p = PurePath(irods_synthetic, expt,
                      "20190904_1514_GA10000_flowcell011_69126024")
         wi = wb.add_work(wb_session, p)
@@ -99,9 +112,9 @@ class TestONTRunMetadataWorkBot(object):
         wb.annotate_output_data(wb_session, wi, mlwh_session=mlwh_session)
 
         coll = Collection(baton_session, PurePath(wi.input_path))
-        assert AVU("sample", "sample 1") in coll.metadata()
-        assert AVU("study_id", "study_02") in coll.metadata()
-        assert AVU("study", "Study Y") in coll.metadata()
+        assert coll.has_metadata(AVU("sample", "sample 1"),
+                                 AVU("study_id", "study_02"),
+                                 AVU("study", "Study Y"))
 
         ac = AC("ss_study_02", Permission.READ, zone="testZone")
         assert ac in coll.acl()
@@ -115,8 +128,7 @@ class TestONTRunMetadataWorkBot(object):
         expt = "multiplexed_experiment_001"
         pos = 1
 
-        wt = WorkType.ONTRunMetadataUpdate.name
-        wb = ONTRunMetadataWorkBot(wt)
+        wb = ONTRunMetadataWorkBot(_UPDATE_NAME)
         p = PurePath(irods_synthetic, expt,
                      "20190904_1514_GA10000_flowcell101_cf751ba1")
         wi = wb.add_work(wb_session, p)
@@ -132,12 +144,12 @@ class TestONTRunMetadataWorkBot(object):
         wb.annotate_output_data(wb_session, wi, mlwh_session=mlwh_session)
         assert wi.is_annotated()
 
+        coll = Collection(baton_session, PurePath(wi.input_path))
+        metadata = coll.contents_metadata()
         for tag_index in range(1, 12):
-            bc_dir = "barcode{}".format(str(tag_index).zfill(2))
-            bc_coll = Collection(baton_session,
-                                 PurePath(wi.input_path, bc_dir))
+            bc_path = PurePath(wi.input_path, barcode_name(tag_index))
 
-            assert AVU("tag_index", tag_index) in bc_coll.metadata()
+            assert AVU("tag_index", tag_index) in metadata[bc_path]
 
     @tests_have_admin
     @m.it("Adds sample and study metadata to barcode<0n> sub-collections")
@@ -146,8 +158,7 @@ class TestONTRunMetadataWorkBot(object):
         expt = "multiplexed_experiment_001"
         pos = 1
 
-        wt = WorkType.ONTRunMetadataUpdate.name
-        wb = ONTRunMetadataWorkBot(wt)
+        wb = ONTRunMetadataWorkBot(_UPDATE_NAME)
         p = PurePath(irods_synthetic, expt,
                      "20190904_1514_GA10000_flowcell101_cf751ba1")
         wi = wb.add_work(wb_session, p)
@@ -160,17 +171,19 @@ class TestONTRunMetadataWorkBot(object):
         wb.archive_output_data(wb_session, wi)
         wb.annotate_output_data(wb_session, wi, mlwh_session=mlwh_session)
 
+        coll = Collection(baton_session, PurePath(wi.input_path))
+        metadata = coll.contents_metadata()
         for tag_index in range(1, 12):
-            bc_dir = "barcode{}".format(str(tag_index).zfill(2))
-            bc_coll = Collection(baton_session,
-                                 PurePath(wi.input_path, bc_dir))
+            bc_path = PurePath(wi.input_path, barcode_name(tag_index))
 
             sid = "sample {}".format(tag_index)
-            assert AVU("sample", sid) in bc_coll.metadata()
-            assert AVU("study_id", "study_03") in bc_coll.metadata()
-            assert AVU("study", "Study Z") in bc_coll.metadata()
+            expected = {AVU("sample", sid),
+                        AVU("study_id", "study_03"),
+                        AVU("study", "Study Z")}
+            assert expected.issubset(metadata[bc_path])
 
             ac = AC("ss_study_03", Permission.READ, zone="testZone")
+            bc_coll = Collection(baton_session, bc_path)
             assert ac in bc_coll.acl()
             for item in bc_coll.contents():
                 assert ac in item.acl(), "{} is in {} ACL".format(ac, item)
@@ -182,8 +195,7 @@ class TestONTRunMetadataWorkBot(object):
         expt = "multiplexed_experiment_001"
         pos = 1
 
-        wt = WorkType.ONTRunMetadataUpdate.name
-        wb = ONTRunMetadataWorkBot(wt)
+        wb = ONTRunMetadataWorkBot(_UPDATE_NAME)
         p = PurePath(irods_synthetic, expt,
                      "20190904_1514_GA10000_flowcell101_cf751ba1")
         wi = wb.add_work(wb_session, p)
@@ -205,8 +217,7 @@ class TestONTRunMetadataWorkBot(object):
         expt = "multiplexed_experiment_001"
         pos = 1
 
-        wt = WorkType.ONTRunMetadataUpdate.name
-        wb = ONTRunMetadataWorkBot(wt)
+        wb = ONTRunMetadataWorkBot(_UPDATE_NAME)
         p = PurePath(irods_synthetic, expt,
                      "20190904_1514_GA10000_flowcell101_cf751ba1")
         wi = wb.add_work(wb_session, p)
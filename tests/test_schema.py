@@ -1,13 +1,18 @@
 import pytest
 from pytest import mark as m
 
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+
 from tests.conftest import config
-from tests.schema_fixture import wb_session
+from tests.schema_fixture import sqlite_url, wb_engine, wb_session
 from workbot.enums import WorkState, WorkType
-from workbot.schema import StateTransitionError, WorkInstance, find_state
+from workbot.schema import State, StateTransitionError, WorkBotDBBase, \
+    WorkInstance, find_state, initialize_database
 
 #  Stop IDEs "optimizing" away these imports
 _ = config
+_ = wb_engine
 _ = wb_session
 
 
@@ -33,29 +38,14 @@ class TestStateTransitions(object):
         assert wi.state.name == WorkState.CANCELLED
 
     @m.it("Raises exceptions on invalid transitions")
-    def test_pending_transition_except(self, wb_session):
+    @pytest.mark.parametrize("transition", ["started", "succeeded", "archived",
+                                            "annotated", "unstaged",
+                                            "completed", "failed"])
+    def test_pending_transition_except(self, wb_session, transition):
         wi = make_instance(wb_session)
 
         with pytest.raises(StateTransitionError):
-            wi.started(wb_session)
-
-        with pytest.raises(StateTransitionError):
-            wi.succeeded(wb_session)
-
-        with pytest.raises(StateTransitionError):
-            wi.archived(wb_session)
-
-        with pytest.raises(StateTransitionError):
-            wi.annotated(wb_session)
-
-        with pytest.raises(StateTransitionError):
-            wi.unstaged(wb_session)
-
-        with pytest.raises(StateTransitionError):
-            wi.completed(wb_session)
-
-        with pytest.raises(StateTransitionError):
-            wi.failed(wb_session)
+            getattr(wi, transition)(wb_session)
 
     @m.context("When staged")
     @m.it("Can be started")
@@ -71,23 +61,14 @@ class TestStateTransitions(object):
         assert wi.state.name == WorkState.UNSTAGED
 
     @m.it("Raises exceptions on invalid transitions from staged")
-    def test_staged_transition_except(self, wb_session):
+    @pytest.mark.parametrize("transition", ["succeeded", "archived",
+                                            "annotated", "failed",
+                                            "completed"])
+    def test_staged_transition_except(self, wb_session, transition):
         wi = make_staged(wb_session)
 
         with pytest.raises(StateTransitionError):
-            wi.succeeded(wb_session)
-
-        with pytest.raises(StateTransitionError):
-            wi.archived(wb_session)
-
-        with pytest.raises(StateTransitionError):
-            wi.annotated(wb_session)
-
-        with pytest.raises(StateTransitionError):
-            wi.failed(wb_session)
-
-        with pytest.raises(StateTransitionError):
-            wi.completed(wb_session)
+            getattr(wi, transition)(wb_session)
 
     @m.context("When started")
     @m.it("Can succeed")
@@ -109,23 +90,13 @@ class TestStateTransitions(object):
         assert wi.state.name == WorkState.CANCELLED
 
     @m.it("Raises exceptions on invalid transitions from started")
-    def test_started_transition_except(self, wb_session):
+    @pytest.mark.parametrize("transition", ["started", "archived", "annotated",
+                                            "unstaged", "completed"])
+    def test_started_transition_except(self, wb_session, transition):
         wi = make_started(wb_session)
 
         with pytest.raises(StateTransitionError):
-            wi.started(wb_session)
-
-        with pytest.raises(StateTransitionError):
-            wi.archived(wb_session)
-
-        with pytest.raises(StateTransitionError):
-            wi.annotated(wb_session)
-
-        with pytest.raises(StateTransitionError):
-            wi.unstaged(wb_session)
-
-        with pytest.raises(StateTransitionError):
-            wi.completed(wb_session)
+            getattr(wi, transition)(wb_session)
 
     @m.context("When succeeded")
     @m.it("Can be archived")
@@ -135,23 +106,13 @@ class TestStateTransitions(object):
         assert wi.state.name == WorkState.ARCHIVED
 
     @m.it("Raises exceptions on invalid transitions from succeeded")
-    def test_succeeded_transition_except(self, wb_session):
+    @pytest.mark.parametrize("transition", ["started", "annotated", "unstaged",
+                                            "failed", "completed"])
+    def test_succeeded_transition_except(self, wb_session, transition):
         wi = make_succeeded(wb_session)
 
         with pytest.raises(StateTransitionError):
-            wi.started(wb_session)
-
-        with pytest.raises(StateTransitionError):
-            wi.annotated(wb_session)
-
-        with pytest.raises(StateTransitionError):
-            wi.unstaged(wb_session)
-
-        with pytest.raises(StateTransitionError):
-            wi.failed(wb_session)
-
-        with pytest.raises(StateTransitionError):
-            wi.completed(wb_session)
+            getattr(wi, transition)(wb_session)
 
     @m.context("When archived")
     @m.it("Can be annotated")
@@ -161,20 +122,13 @@ class TestStateTransitions(object):
         assert wi.state.name == WorkState.ANNOTATED
 
     @m.it("Raises exceptions on invalid transitions from archived")
-    def test_succeeded_transition_except(self, wb_session):
+    @pytest.mark.parametrize("transition", ["started", "unstaged", "failed",
+                                            "completed"])
+    def test_archived_transition_except(self, wb_session, transition):
         wi = make_archived(wb_session)
 
         with pytest.raises(StateTransitionError):
-            wi.started(wb_session)
-
-        with pytest.raises(StateTransitionError):
-            wi.unstaged(wb_session)
-
-        with pytest.raises(StateTransitionError):
-            wi.failed(wb_session)
-
-        with pytest.raises(StateTransitionError):
-            wi.completed(wb_session)
+            getattr(wi, transition)(wb_session)
 
     @m.context("When it has been annotated")
     @m.it("Can be unstaged")
@@ -198,20 +152,59 @@ class TestStateTransitions(object):
         assert wi.state.name == WorkState.CANCELLED
 
     @m.it("Raises exceptions on invalid transitions from failed")
-    def test_failed_transition_except(self, wb_session):
+    @pytest.mark.parametrize("transition", ["started", "failed", "unstaged",
+                                            "completed"])
+    def test_failed_transition_except(self, wb_session, transition):
         wi = make_failed(wb_session)
 
         with pytest.raises(StateTransitionError):
-            wi.started(wb_session)
-
-        with pytest.raises(StateTransitionError):
-            wi.failed(wb_session)
-
-        with pytest.raises(StateTransitionError):
-            wi.unstaged(wb_session)
-
-        with pytest.raises(StateTransitionError):
-            wi.completed(wb_session)
+            getattr(wi, transition)(wb_session)
+
+
+@m.describe("WorkInstance transition table")
+class TestCanTransition(object):
+    @m.context("When in a state")
+    @m.it("Permits only the transitions from that state")
+    @pytest.mark.parametrize("current, permitted", [
+        (WorkState.PENDING, [WorkState.STAGED]),
+        (WorkState.STAGED, [WorkState.STARTED, WorkState.UNSTAGED]),
+        (WorkState.STARTED, [WorkState.SUCCEEDED, WorkState.FAILED]),
+        (WorkState.SUCCEEDED, [WorkState.ARCHIVED]),
+        (WorkState.ARCHIVED, [WorkState.ANNOTATED]),
+        (WorkState.ANNOTATED, [WorkState.UNSTAGED]),
+        (WorkState.UNSTAGED, [WorkState.COMPLETED]),
+        (WorkState.COMPLETED, []),
+        (WorkState.FAILED, []),
+        (WorkState.CANCELLED, [])])
+    def test_can_transition(self, current, permitted):
+        # A transient State is enough; no database is needed
+        wi = WorkInstance("/seq/ont/gridion/experiment_1",
+                          WorkType.ARTICNextflow.name, State(current))
+
+        for new in WorkState:
+            expected = new in permitted or new == WorkState.CANCELLED
+            assert wi.can_transition(new) == expected, \
+                "{} to {}".format(current.name, new.name)
+
+
+@m.describe("Database initialization")
+class TestInitializeDatabase(object):
+    @m.context("When a database is initialized")
+    @m.it("Has a State for every WorkState")
+    def test_initialize_database(self):
+        # The wb_engine fixture seeds its States without the ORM, so the
+        # production initializer is tested on a database of its own
+        engine = create_engine(sqlite_url(), echo=False)
+        WorkBotDBBase.metadata.create_all(engine)
+
+        sess = Session(bind=engine)
+        try:
+            initialize_database(sess)
+            assert sorted(s.name.name for s in sess.query(State)) == \
+                sorted(ws.name for ws in WorkState)
+        finally:
+            sess.close()
+            engine.dispose()
 
 
 def make_instance(session):
@@ -225,54 +218,46 @@ def make_instance(session):
 def make_staged(session):
     wi = make_instance(session)
     wi.staged(session)
-    session.commit()
     return wi
 
 
 def make_started(session):
     wi = make_staged(session)
     wi.started(session)
-    session.commit()
     return wi
 
 
 def make_succeeded(session):
     wi = make_started(session)
     wi.succeeded(session)
-    session.commit()
     return wi
 
 
 def make_archived(session):
     wi = make_succeeded(session)
     wi.archived(session)
-    session.commit()
     return wi
 
 
 def make_annotated(session):
     wi = make_archived(session)
     wi.annotated(session)
-    session.commit()
     return wi
 
 
 def make_unstaged(session):
     wi = make_annotated(session)
     wi.unstaged(session)
-    session.commit()
     return wi
 
 
 def make_failed(session):
     wi = make_started(session)
     wi.failed(session)
-    session.commit()
     return wi
 
 
 def make_completed(session):
     wi = make_unstaged(session)
     wi.completed(session)
-    session.commit()
     return wi
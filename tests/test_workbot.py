@@ -3,20 +3,28 @@ from pathlib import Path, PurePath
 import pytest
 from pytest import mark as m
 
-from tests.irods_fixture import baton_session, irods_gridion
-from tests.ml_warehouse_fixture import mlwh_session
-from tests.schema_fixture import wb_session
+from tests.irods_fixture import baton_session, irods_gridion, \
+    irods_gridion_master, irods_test_root
+from tests.ml_warehouse_fixture import mlwh_engine, mlwh_session
+from tests.schema_fixture import wb_engine, wb_session
 from workbot.base import AnalysisError, WorkBot, make_workbot
 from workbot.enums import WorkState, WorkType
 from workbot.irods import imkdir
 from workbot.ont import ONTRunDataWorkBot, ONTRunMetadataWorkBot
 
 #  Stop IDEs "optimizing" away these imports
+_ = mlwh_engine
 _ = mlwh_session
+_ = wb_engine
 _ = wb_session
 
 _ = irods_gridion
 _ = baton_session
+_ = irods_test_root
+_ = irods_gridion_master
+
+# The work type name used throughout these tests
+_EMPTY_NAME = WorkType.EMPTY.name
 
 
 @m.describe("WorkBot")
@@ -30,7 +38,7 @@ class TestWorkbot(object):
     @m.context("When a work type is set")
     @m.it("Appears in its compatible worktypes")
     def test_make_compatible_worktype(self):
-        work_type = WorkType.EMPTY.name
+        work_type = _EMPTY_NAME
         assert work_type in WorkBot(work_type).compatible_work_types()
 
         with pytest.raises(ValueError, match="invalid work type"):
@@ -38,7 +46,7 @@ class TestWorkbot(object):
 
     @m.it("Has the correct default root paths")
     def test_make_workbot_ont_run_data_paths(self):
-        wb = WorkBot(WorkType.EMPTY.name)
+        wb = WorkBot(_EMPTY_NAME)
         assert wb.archive_root is not None
         assert wb.staging_root is not None
 
@@ -47,13 +55,13 @@ class TestWorkbot(object):
 class TestWorkBotFactory(object):
     @m.context("When a work type is specified")
     @m.it("Creates the correct type of Workbot")
-    def test_workbot_factory(self):
-        pairs = [(WorkType.EMPTY, WorkBot),
-                 (WorkType.ARTICNextflow, ONTRunDataWorkBot),
-                 (WorkType.ONTRunMetadataUpdate, ONTRunMetadataWorkBot)]
-
-        for worktype_name, cls in pairs:
-            assert make_workbot(worktype_name).__class__ == cls
+    @pytest.mark.parametrize("work_type, cls",
+                             [(WorkType.EMPTY, WorkBot),
+                              (WorkType.ARTICNextflow, ONTRunDataWorkBot),
+                              (WorkType.ONTRunMetadataUpdate,
+                               ONTRunMetadataWorkBot)])
+    def test_workbot_factory(self, work_type, cls):
+        assert make_workbot(work_type).__class__ == cls
 
     @m.it("Passes kwargs to the constructor")
     def test_workbot_factory_kwargs(self):
@@ -75,7 +83,7 @@ class TestFindingAnalyses(object):
         archive_root = PurePath("/dummy")
         staging_root = Path("/dummy")
 
-        wb = WorkBot(WorkType.EMPTY.name,
+        wb = WorkBot(_EMPTY_NAME,
                      archive_root=archive_root,
                      staging_root=staging_root)
         wi = wb.add_work(wb_session, input_path)
@@ -90,7 +98,7 @@ class TestFindingAnalyses(object):
         archive_root = "/dummy"
         staging_root = "/dummy"
 
-        wb = WorkBot(WorkType.EMPTY.name,
+        wb = WorkBot(_EMPTY_NAME,
                      archive_root=archive_root,
                      staging_root=staging_root)
         _ = wb.add_work(wb_session, input_path)
@@ -103,16 +111,18 @@ class TestFindingAnalyses(object):
 class TestAddingAnalyses(object):
     @m.context("When there is no existing analysis")
     @m.it("Can be added")
-    def test_add_analysis(self, wb_session):
-        input_path = PurePath("/seq/ont/gridion/experiment_01")
-        archive_root = "/dummy"
-        staging_root = "/dummy"
-
-        wb = WorkBot(WorkType.EMPTY.name, archive_root, staging_root)
+    @pytest.mark.parametrize("input_path, archive_root, staging_root",
+                             [(PurePath("/seq/ont/gridion/experiment_01"),
+                               PurePath("/dummy"), Path("/dummy")),
+                              ("/seq/ont/gridion/experiment_01",
+                               "/dummy", "/dummy")])
+    def test_add_analysis(self, wb_session, input_path, archive_root,
+                          staging_root):
+        wb = WorkBot(_EMPTY_NAME, archive_root, staging_root)
         assert wb.find_work(wb_session, input_path) == []
 
         wi = wb.add_work(wb_session, input_path)
-        assert wi.input_path == input_path
+        assert wi.input_path == PurePath(input_path)
         assert wi.state.name == WorkState.PENDING
 
         assert wb.find_work(wb_session, input_path) == [wi]
@@ -124,7 +134,7 @@ class TestAddingAnalyses(object):
         archive_root = "/dummy"
         staging_root = "/dummy"
 
-        wb = WorkBot(WorkType.EMPTY.name, archive_root, staging_root)
+        wb = WorkBot(_EMPTY_NAME, archive_root, staging_root)
         wi = wb.add_work(wb_session, input_path)
         assert wb.find_work(wb_session, input_path,
                             states=[WorkState.PENDING]) == [wi]
@@ -141,10 +151,10 @@ class TestAddingAnalyses(object):
         archive_root = PurePath("/dummy")
         staging_root = Path("/dummy")
 
-        wb = WorkBot(WorkType.EMPTY.name, archive_root, staging_root)
+        wb = WorkBot(_EMPTY_NAME, archive_root, staging_root)
         wi = wb.add_work(wb_session, input_path)
         wi.cancelled(wb_session)
-        wb_session.commit()
+        wb_session.flush()
 
         assert wb.find_work(wb_session, input_path,
                             states=[WorkState.CANCELLED]) == [wi]
@@ -163,7 +173,7 @@ class TestPreAnalysis(object):
         archive_root = PurePath("/dummy")
         staging_root = Path("/dummy")
 
-        wb = WorkBot(WorkType.EMPTY.name, archive_root, staging_root)
+        wb = WorkBot(_EMPTY_NAME, archive_root, staging_root)
         p = Path(irods_gridion, "dummy_input")
         wi = wb.add_work(wb_session, p)
 
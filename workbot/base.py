@@ -28,7 +28,7 @@ from abc import ABCMeta, abstractmethod
 from pathlib import Path, PurePath
 from typing import FrozenSet, List, Union
 
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, contains_eager
 
 from workbot import irods
 from workbot.config import load_classes_from_config, read_config
@@ -294,10 +294,14 @@ class WorkBot(object):
     config = read_config()
     """The configuration read from workbot.ini when the class is loaded."""
 
-    def __compatible_work_types(self):
+    # The configuration does not change once read, so the compatible work
+    # types are found once per class
+    @classmethod
+    @functools.lru_cache(maxsize=None)
+    def __compatible_work_types(cls):
         compat = set()
 
-        qualified_name = qualified_class_name(self.__class__)
+        qualified_name = qualified_class_name(cls)
         for sec in WorkBot.config.sections():
             for key, value in WorkBot.config.items(sec):
                 if key == "class" and value == qualified_name:
@@ -364,11 +368,11 @@ class WorkBot(object):
             raise ValueError("invalid work_type '{}' did "
                              "not match [A-Za-z0-9_-]+$".format(work_type))
 
-        if work_type not in self.compatible_work_types():
+        compatible = self.compatible_work_types()
+        if work_type not in compatible:
             raise ValueError(
                     "invalid work type; '{}' was not one of the compatible "
-                    "work types {}".format(work_type,
-                                           self.compatible_work_types()))
+                    "work types {}".format(work_type, compatible))
         self.work_type = work_type
 
         aroot, sroot = archive_root, staging_root
@@ -438,8 +442,11 @@ class WorkBot(object):
         Returns: List[WorkInstance]
         """
 
+        # The State is loaded by the same query, so that callers may inspect
+        # the state of each WorkInstance without another query
         q = session.query(WorkInstance). \
             join(State). \
+            options(contains_eager(WorkInstance.state)). \
             filter(WorkInstance.input_path == os.fspath(input_path)). \
             filter(WorkInstance.work_type == self.work_type)
 
@@ -471,17 +478,19 @@ class WorkBot(object):
             AnalysisError: An error occurred adding the analysis.
         """
 
-        ended = self.find_work(session, input_path, states=self.end_states)
+        # All the existing work for the input is found with one query and
+        # then partitioned by state
+        existing = self.find_work(session, input_path)
+
+        ended = [wi for wi in existing if wi.state.name in self.end_states]
         if ended:
             raise AnalysisError("An error occurred adding the analysis: "
                                 "analyses already "
                                 "exist for input {}: {}".format(input_path,
                                                                 ended))
 
-        incomplete = self.find_work(session, input_path,
-                                    not_states={*self.end_states,
-                                                WorkState.CANCELLED,
-                                                WorkState.COMPLETED})
+        finished = {*self.end_states, WorkState.CANCELLED, WorkState.COMPLETED}
+        incomplete = [wi for wi in existing if wi.state.name not in finished]
         if incomplete:
             log.info("No new analysis added. Incomplete analyses already "
                      "exist for input {}: {}".format(input_path, incomplete))
@@ -650,9 +659,9 @@ class WorkBot(object):
         dst = self.archive_path(wi)
 
         try:
-            coll = self.rods_handler.collection(dst)
-            if not coll.exists():
-                self.rods_handler.imkdir(dst, make_parents=True)
+            # imkdir -p succeeds if the collection exists already, so there
+            # is no need to check for it first
+            self.rods_handler.imkdir(dst, make_parents=True)
 
             self.rods_handler.iput(src, dst, force=True, verify_checksum=True,
                                    recurse=True)
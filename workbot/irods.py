@@ -82,6 +82,8 @@ class Permission(Enum):
 class AC(object):
     """AC is an iRODS access control."""
 
+    __slots__ = ("user", "zone", "perm")
+
     SEPARATOR = "#"
 
     def __init__(self, user: str, perm: Permission, zone=None):
@@ -144,6 +146,9 @@ class AVU(object):
     units (if present).
     """
 
+    # Many AVUs are created when listing metadata, so they have no __dict__
+    __slots__ = ("_namespace", "_attribute", "_value", "_units")
+
     SEPARATOR = ":"
     """The attribute namespace separator"""
 
@@ -409,12 +414,19 @@ class BatonClient(object):
     MSG = "message"
     CODE = "code"
 
+    # The most request bytes written to baton-do before its responses are
+    # read. baton-do echoes each target in its response, so keeping both
+    # within the OS pipe buffers (commonly 64 KiB) ensures that baton-do
+    # never blocks writing a response while the client blocks writing a
+    # request.
+    MAX_PIPELINE_BYTES = 16 * 1024
+
     def __init__(self):
         self.proc = None
 
     def is_running(self) -> bool:
         """Returns true if the client is running."""
-        return self.proc and self.proc.poll() is None
+        return self.proc is not None and self.proc.poll() is None
 
     def start(self):
         """Starts the client if it is not already running."""
@@ -431,9 +443,11 @@ class BatonClient(object):
                   "with PID {}".format(self.proc.pid))
 
     def stop(self):
-        """Stops the client if it is running."""
+        """Stops the client if it is running. Stopping a client that is not
+        running has no effect."""
         if not self.is_running():
-            log.warning("Tried to start a BatonClient that is not running")
+            log.debug("Tried to stop a BatonClient that is not running")
+            self.proc = None
             return
 
         self.proc.stdin.close()
@@ -467,6 +481,22 @@ class BatonClient(object):
         args = {BatonClient.OP: BatonClient.ADD}
         self._execute(BatonClient.METAMOD, args, item)
 
+    def meta_add_bulk(self, items: List[Dict]):
+        """Adds metadata to a number of items. The requests are sent to
+        baton in batches, reading the responses after each batch, rather than
+        making a round trip for each item.
+
+        Unlike RodsItem.meta_add, this does not first list the items'
+        metadata to skip AVUs that are already present. Adding an AVU that
+        an item already has raises a RodsError, after the other items have
+        been processed.
+
+        Args:
+            items: Items, each including the AVUs to add to it.
+        """
+        args = {BatonClient.OP: BatonClient.ADD}
+        self._execute_many(BatonClient.METAMOD, args, items)
+
     def meta_rem(self, item: Dict):
         args = {BatonClient.OP: BatonClient.REM}
         self._execute(BatonClient.METAMOD, args, item)
@@ -496,15 +526,28 @@ class BatonClient(object):
         self._execute(BatonClient.CHMOD, args, item)
 
     def _execute(self, operation: str, args: Dict, item: Dict) -> Dict:
+        self._ensure_running()
+
+        response = self._send(self._wrap(operation, args, item))
+        return self._unwrap(response)
+
+    def _execute_many(self, operation: str, args: Dict,
+                      items: List[Dict]) -> List[Dict]:
+        self._ensure_running()
+
+        envelopes = [self._wrap(operation, args, item) for item in items]
+        # All the responses are read before any are unwrapped (which may
+        # raise an exception) to leave no unread responses from baton-do
+        responses = self._send_many(envelopes)
+        return [self._unwrap(response) for response in responses]
+
+    def _ensure_running(self):
         if not self.is_running():
             log.debug("baton-do is not running ... starting")
             self.start()
             if not self.is_running():
                 raise BatonError("baton-do failed to start")
 
-        response = self._send(self._wrap(operation, args, item))
-        return self._unwrap(response)
-
     @staticmethod
     def _wrap(operation: str, args: Dict, item: Dict) -> Dict:
         return {BatonClient.OP: operation,
@@ -544,6 +587,39 @@ class BatonClient(object):
 
         return json.loads(resp, object_hook=as_baton)
 
+    def _send_many(self, envelopes: List[Dict]) -> List[Dict]:
+        responses = []
+
+        batch, batch_bytes = [], 0
+        for envelope in envelopes:
+            msg = bytes(json.dumps(envelope, cls=BatonJSONEncoder), 'utf-8')
+            if batch and batch_bytes + len(msg) > self.MAX_PIPELINE_BYTES:
+                responses.extend(self._send_batch(batch))
+                batch, batch_bytes = [], 0
+
+            batch.append(msg)
+            batch_bytes += len(msg)
+
+        if batch:
+            responses.extend(self._send_batch(batch))
+
+        return responses
+
+    def _send_batch(self, msgs: List[bytes]) -> List[Dict]:
+        encoded = b"".join(msgs)
+        log.debug("Sending {}".format(encoded))
+
+        self.proc.stdin.write(encoded)
+        self.proc.stdin.flush()
+
+        responses = []
+        for _ in msgs:
+            resp = self.proc.stdout.readline()
+            log.debug("Received {}".format(resp))
+            responses.append(json.loads(resp, object_hook=as_baton))
+
+        return responses
+
     @staticmethod
     def _zone_hint_to_path(zone) -> str:
         z = str(zone)
@@ -752,6 +828,17 @@ class RodsItem(PathLike):
                              "from {}".format(BatonClient.AVUS, item))
         return sorted(item[BatonClient.AVUS])
 
+    def has_metadata(self, *avus: Union[AVU, Tuple[AVU]]) -> bool:
+        """Return true if all the argument AVUs are in the item's metadata.
+        The metadata are fetched once, however many AVUs are tested.
+
+        Args:
+            *avus: AVUs to test.
+
+        Returns: bool
+        """
+        return set(avus).issubset(self.metadata())
+
     def acl(self) -> List[AC]:
         """Return the item's Access Control List (ACL).
 
@@ -833,6 +920,24 @@ class Collection(RodsItem):
 
         return [make_rods_item(self.client, item) for item in items]
 
+    def contents_metadata(self) -> Dict[PurePath, List[AVU]]:
+        """Return the metadata of each item in the Collection contents,
+        fetched in a single listing of the Collection.
+
+        Returns: Dict[PurePath, List[AVU]]
+        """
+        items = self._list(avu=True, contents=True)
+
+        metadata = {}
+        for item in items:
+            if BatonClient.AVUS not in item.keys():
+                raise BatonError("{} key missing "
+                                 "from {}".format(BatonClient.AVUS, item))
+            path = PurePath(make_rods_item(self.client, item))
+            metadata[path] = sorted(item[BatonClient.AVUS])
+
+        return metadata
+
     def list(self, acl=False, avu=False) -> Collection:
         """Return a new Collection representing this one.
 
@@ -902,12 +1007,18 @@ def rmgroup(name: str):
     _run(cmd)
 
 
-def imkdir(remote_path: Union[PurePath, str], make_parents=True):
+def lsgroups() -> List[str]:
+    """Returns the names of the iRODS groups."""
+    cmd = ["iadmin", "lg"]
+    return _run(cmd).splitlines()
+
+
+def imkdir(*remote_paths: Union[PurePath, str], make_parents=True):
     cmd = ["imkdir"]
     if make_parents:
         cmd.append("-p")
 
-    cmd.append(remote_path)
+    cmd.extend(remote_paths)
     _run(cmd)
 
 
@@ -927,7 +1038,7 @@ def iget(remote_path: Union[PurePath, str], local_path: Union[PurePath, str],
 
 
 def iput(local_path: Union[PurePath, str], remote_path: Union[PurePath, str],
-         force=False, verify_checksum=True, recurse=False):
+         force=False, verify_checksum=True, recurse=False, bulk=False):
     cmd = ["iput"]
     if force:
         cmd.append("-f")
@@ -935,28 +1046,46 @@ def iput(local_path: Union[PurePath, str], remote_path: Union[PurePath, str],
         cmd.append("-K")
     if recurse:
         cmd.append("-r")
+    if bulk:
+        # Bulk upload sends many small files in fewer, larger transfers
+        cmd.append("-b")
 
     cmd.append(local_path)
     cmd.append(remote_path)
     _run(cmd)
 
 
-def irm(remote_path: Union[PurePath, str], force=False, recurse=False):
+def icp(remote_src: Union[PurePath, str], remote_dst: Union[PurePath, str],
+        force=False, verify_checksum=True, recurse=False):
+    cmd = ["icp"]
+    if force:
+        cmd.append("-f")
+    if verify_checksum:
+        cmd.append("-K")
+    if recurse:
+        cmd.append("-r")
+
+    cmd.append(remote_src)
+    cmd.append(remote_dst)
+    _run(cmd)
+
+
+def irm(*remote_paths: Union[PurePath, str], force=False, recurse=False):
     cmd = ["irm"]
     if force:
         cmd.append("-f")
     if recurse:
         cmd.append("-r")
 
-    cmd.append(remote_path)
+    cmd.extend(remote_paths)
     _run(cmd)
 
 
-def _run(cmd: List[str]):
+def _run(cmd: List[str]) -> str:
     log.debug("Running {}".format(cmd))
 
     completed = subprocess.run(cmd, capture_output=True)
     if completed.returncode == 0:
-        return
+        return completed.stdout.decode("utf-8")
 
     raise RodsError(completed.stderr.decode("utf-8").rstrip(), 0)
@@ -222,16 +222,15 @@ def find_recent_ont_pos(session: Session,
         since: A datetime.
 
     Returns:
-        List of matching (experiment name, position) tuples
+        List of matching (experiment name, position) tuples, in no particular
+        order
     """
 
     return session.query(OseqFlowcell.experiment_name,
                          OseqFlowcell.instrument_slot). \
         filter(OseqFlowcell.last_updated >= since). \
         group_by(OseqFlowcell.experiment_name,
-                 OseqFlowcell.instrument_slot). \
-        order_by(OseqFlowcell.experiment_name.asc(),
-                 OseqFlowcell.instrument_slot.asc()).all()
+                 OseqFlowcell.instrument_slot).all()
 
 
 def find_ont_plex_info(session: Session, experiment_name: str,
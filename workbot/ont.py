@@ -29,7 +29,7 @@ from workbot.base import AnnotationMixin, RodsHandler, WorkBot, WorkBroker, \
     analyse_op, annotate_op, archive_op, complete_op, log, register, \
     stage_op, unstage_op
 from workbot.enums import WorkState
-from workbot.irods import AVU, BatonError, Collection
+from workbot.irods import AVU, BatonError, Collection, RodsError
 from workbot.metadata import ONTMetadata
 from workbot.ml_warehouse_metadata import make_sample_acl, \
     make_sample_metadata, \
@@ -127,13 +127,15 @@ class ONTRunDataWorkBot(ONTWorkBot):
         coll = self.rods_handler.collection(dst)
 
         try:
+            # All the AVUs are added with a single metadata operation
+            avus = []
             for m in meta:
-                avus = [AVU(ONTMetadata.EXPERIMENT_NAME.value,
-                            m.experiment_name),
-                        AVU(ONTMetadata.INSTRUMENT_SLOT.value,
-                            m.instrument_slot)]
-                avus = [avu.with_namespace(ONTMetadata.namespace) for avu in
-                        avus]
+                avus.append(AVU(ONTMetadata.EXPERIMENT_NAME.value,
+                                m.experiment_name))
+                avus.append(AVU(ONTMetadata.INSTRUMENT_SLOT.value,
+                                m.instrument_slot))
+            avus = [avu.with_namespace(ONTMetadata.namespace) for avu in avus]
+            if avus:
                 coll.meta_add(*avus)
         except BatonError as e:
             log.error("Failed to annotate output data "
@@ -199,19 +201,17 @@ class ONTRunMetadataWorkBot(ONTWorkBot):
                                              fc.tag_index))
 
             if fc.tag_index:
-                # This is the barcode directory naming style created by ONT's
-                # Guppy and qcat de-plexers. We add information to the
-                # barcode sub-collection.
-                p = path / "barcode{}".format(str(fc.tag_index).zfill(2))
+                # We add information to the barcode sub-collection.
+                p = path / barcode_name(fc.tag_index)
                 log.debug("Annotating iRODS path {} with "
                           "tag index {}".format(p, fc.tag_index))
                 log.debug("Annotating iRODS path {} with "
                           "{} and {}".format(p, fc.sample, fc.study))
 
                 coll = self.rods_handler.collection(p)
-                coll.meta_add(AVU("tag_index", fc.tag_index))
-                coll.meta_add(*make_study_metadata(fc.study))
-                coll.meta_add(*make_sample_metadata(fc.sample))
+                coll.meta_add(AVU("tag_index", fc.tag_index),
+                              *make_study_metadata(fc.study),
+                              *make_sample_metadata(fc.sample))
 
                 # The ACL could be different for each plex
                 coll.ac_add(*make_sample_acl(fc.sample, fc.study),
@@ -221,8 +221,8 @@ class ONTRunMetadataWorkBot(ONTWorkBot):
                 # multiplexed run, so we add information to the containing
                 # collection.
                 coll = self.rods_handler.collection(path)
-                coll.meta_add(*make_study_metadata(fc.study))
-                coll.meta_add(*make_sample_metadata(fc.sample))
+                coll.meta_add(*make_study_metadata(fc.study),
+                              *make_sample_metadata(fc.sample))
 
                 coll.ac_add(*make_sample_acl(fc.sample, fc.study),
                             recurse=True)
@@ -247,24 +247,35 @@ class ONTRodsHandler(RodsHandler):
         """
         complete = False
 
-        if self.is_input_path_present(wi):
-            log.info("Checking for complete input data for {}".format(wi))
-            # If a file named .*final_report.txt.gz is present, the run is
-            # complete
-
-            try:
-                coll = Collection(self.client, wi.input_path)
-                matches = list(filter(lambda p:
-                                      re.search(r'final_report.txt.gz$',
-                                                os.fspath(p)),
-                                      coll.contents()))
-                if list(matches):
-                    log.debug("Found final report matches: {}".format(matches))
-                    complete = True
-            except BatonError as e:
-                log.error("Failed to check input data "
-                          "for {}: {}".format(wi, e))
-                raise
+        log.info("Checking for complete input data for {}".format(wi))
+        coll = Collection(self.client, wi.input_path)
+        try:
+            # Listing the contents also shows whether the input path is
+            # present, so it is not checked separately
+            contents = coll.contents()
+        except RodsError as e:
+            if e.code == -310000:
+                log.info("Input collection {} for "
+                         "{} does not exist".format(coll, wi))
+                return complete
+
+            log.error("Failed to check input data "
+                      "for {}: {}".format(wi, e))
+            raise
+        except BatonError as e:
+            log.error("Failed to check input data "
+                      "for {}: {}".format(wi, e))
+            raise
+
+        # If a file named .*final_report.txt.gz is present, the run is
+        # complete
+        matches = list(filter(lambda p:
+                              re.search(r'final_report.txt.gz$',
+                                        os.fspath(p)),
+                              contents))
+        if matches:
+            log.debug("Found final report matches: {}".format(matches))
+            complete = True
 
         return complete
 
@@ -392,3 +403,15 @@ class ONTWorkBroker(WorkBroker):
                 num_added += 1
 
         return num_added
+
+
+def barcode_name(tag_index: int) -> str:
+    """Returns the barcode directory name that ONT's Guppy and qcat
+    de-plexers give to a tag index e.g. "barcode01".
+
+    Args:
+        tag_index: A tag index.
+
+    Returns: str
+    """
+    return "barcode{:02d}".format(tag_index)
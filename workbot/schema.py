@@ -22,7 +22,8 @@ from pathlib import Path, PurePath
 from typing import List, Union
 
 import sqlalchemy
-from sqlalchemy import Column, DateTime, Enum, ForeignKey, Integer, String
+from sqlalchemy import Column, DateTime, Enum, ForeignKey, Index, Integer, \
+    String
 from sqlalchemy.exc import SQLAlchemyError
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import Session, relationship
@@ -96,6 +97,24 @@ class StateTransitionError(Exception):
 
 class WorkInstance(WorkBotDBBase):
     __tablename__ = 'workinstance'
+    # Work is identified by its input path and work type. MySQL limits the
+    # length of an index key, so only a prefix of the path is indexed there.
+    __table_args__ = (Index('ix_workinstance_input_path_work_type',
+                            'input_path', 'work_type',
+                            mysql_length={'input_path': 255}),)
+
+    # The states from which each state may be entered. Cancelled may be
+    # entered from any state.
+    _transitions = {
+        WorkState.STAGED: [WorkState.PENDING],
+        WorkState.STARTED: [WorkState.STAGED],
+        WorkState.SUCCEEDED: [WorkState.STARTED],
+        WorkState.ARCHIVED: [WorkState.SUCCEEDED],
+        WorkState.ANNOTATED: [WorkState.ARCHIVED],
+        WorkState.UNSTAGED: [WorkState.STAGED, WorkState.ANNOTATED],
+        WorkState.COMPLETED: [WorkState.UNSTAGED],
+        WorkState.FAILED: [WorkState.STARTED]
+    }
 
     id = Column(Integer, autoincrement=True, primary_key=True)
     input_path = Column(PathString(2048), nullable=False)
@@ -145,7 +164,7 @@ class WorkInstance(WorkBotDBBase):
     """
 
     def staged(self, session: Session):
-        if self.state.name != WorkState.PENDING:
+        if not self.can_transition(WorkState.STAGED):
             raise StateTransitionError(self.state.name, WorkState.STAGED)
 
         self._update_state(session, WorkState.STAGED)
@@ -159,8 +178,8 @@ class WorkInstance(WorkBotDBBase):
     """
 
     def started(self, session: Session):
-        if self.state.name != WorkState.STAGED:
-            raise StateTransitionError(self.state.name, WorkState.STAGED)
+        if not self.can_transition(WorkState.STARTED):
+            raise StateTransitionError(self.state.name, WorkState.STARTED)
 
         self._update_state(session, WorkState.STARTED)
 
@@ -173,8 +192,8 @@ class WorkInstance(WorkBotDBBase):
     """
 
     def succeeded(self, session: Session):
-        if self.state.name != WorkState.STARTED:
-            raise StateTransitionError(self.state.name, WorkState.STARTED)
+        if not self.can_transition(WorkState.SUCCEEDED):
+            raise StateTransitionError(self.state.name, WorkState.SUCCEEDED)
 
         self._update_state(session, WorkState.SUCCEEDED)
 
@@ -187,7 +206,7 @@ class WorkInstance(WorkBotDBBase):
     """
 
     def archived(self, session: Session):
-        if self.state.name != WorkState.SUCCEEDED:
+        if not self.can_transition(WorkState.ARCHIVED):
             raise StateTransitionError(self.state.name, WorkState.ARCHIVED)
 
         self._update_state(session, WorkState.ARCHIVED)
@@ -201,7 +220,7 @@ class WorkInstance(WorkBotDBBase):
     """
 
     def annotated(self, session: Session):
-        if self.state.name != WorkState.ARCHIVED:
+        if not self.can_transition(WorkState.ANNOTATED):
             raise StateTransitionError(self.state.name, WorkState.ANNOTATED)
 
         self._update_state(session, WorkState.ANNOTATED)
@@ -215,7 +234,7 @@ class WorkInstance(WorkBotDBBase):
     """
 
     def unstaged(self, session):
-        if self.state.name not in [WorkState.STAGED, WorkState.ANNOTATED]:
+        if not self.can_transition(WorkState.UNSTAGED):
             raise StateTransitionError(self.state.name, WorkState.UNSTAGED)
 
         self._update_state(session, WorkState.UNSTAGED)
@@ -229,7 +248,7 @@ class WorkInstance(WorkBotDBBase):
     """
 
     def completed(self, session: Session):
-        if self.state.name != WorkState.UNSTAGED:
+        if not self.can_transition(WorkState.COMPLETED):
             raise StateTransitionError(self.state.name, WorkState.COMPLETED)
 
         self._update_state(session, WorkState.COMPLETED)
@@ -244,7 +263,7 @@ class WorkInstance(WorkBotDBBase):
     """
 
     def failed(self, session: Session):
-        if self.state.name != WorkState.STARTED:
+        if not self.can_transition(WorkState.FAILED):
             raise StateTransitionError(self.state.name, WorkState.FAILED)
 
         self._update_state(session, WorkState.FAILED)
@@ -260,6 +279,20 @@ class WorkInstance(WorkBotDBBase):
     def cancelled(self, session: Session):
         self._update_state(session, WorkState.CANCELLED)
 
+    def can_transition(self, new: WorkState) -> bool:
+        """Returns True if the current state may be changed to a new state.
+        This checks the transition without touching the database.
+
+        Args:
+            new: A WorkState to move to.
+
+        Returns: bool
+        """
+        if new == WorkState.CANCELLED:
+            return True
+
+        return self.state.name in self._transitions.get(new, [])
+
     def is_pending(self):
         return self.state.name == WorkState.PENDING
 